@@ -0,0 +1,211 @@
+"""
+Benchmark the context store on synthetic data.
+
+    python code/bench_context.py --sizes 1000 10000 --backends json journal sqlite --output bench.json
+
+Each backend gets a fresh store in a temporary directory, filled with generated jobs, employees
+and candidates shaped like mcp_context.json (long summaries and onboarding docs included).
+Results are printed, and written as JSON when --output is given.
+"""
+import atexit
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import context
+
+WORDS = (
+    "candidate experience cloud infrastructure kubernetes terraform python team ownership "
+    "distributed systems reliability mentoring stakeholders delivery latency scalable design "
+    "migration incident review strong solid gap limited depth leadership communication"
+).split()
+SKILLS = ["Python", "Java", "Go", "AWS", "GCP", "Azure", "Docker", "Kubernetes", "Terraform",
+          "React", "SQL", "PostgreSQL", "MongoDB", "Kafka", "Spark", "Git", "Jenkins", "Linux"]
+SOURCES = ["Referral", "LinkedIn", "Career Site", "Agency", "Job Board"]
+EDUCATION = ["Bachelor's", "Master's", "PhD"]
+LOCATIONS = ["Chicago, IL", "Austin, TX", "Seattle, WA", "New York, NY", "Remote"]
+
+
+def _text(rng, chars):
+    words = []
+    size = 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def generate_context(n_candidates, n_jobs=None, n_employees=10, text_chars=2600, seed=0):
+    """Synthetic {jobs, candidates, employees, team_summary} with the same fields as the real file."""
+    rng = random.Random(seed)
+    n_jobs = n_jobs or max(1, n_candidates // 50)
+
+    def uid():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    jobs = {}
+    for _ in range(n_jobs):
+        job_id = uid()
+        jobs[job_id] = {
+            "job_id": job_id,
+            "title": rng.choice(["Senior Software Engineer", "Data Engineer", "ML Engineer", "SRE"]),
+            "specialization": rng.choice(["Cloud Infrastructure", "Platform", "Analytics"]),
+            "years_required": str(rng.randint(2, 10)),
+            "job_description": _text(rng, 4000),
+        }
+
+    job_ids = list(jobs)
+    candidates = {}
+    for _ in range(n_candidates):
+        cid = uid()
+        llama, gemini = rng.randint(1, 10), rng.randint(1, 10)
+        name = f"Candidate {cid[:8]}"
+        candidates[cid] = {
+            "Name": name,
+            "Email": f"{cid[:8]}@example.com",
+            "Years of Experience": str(rng.randint(0, 20)),
+            "Key Skills": rng.sample(SKILLS, rng.randint(3, 12)),
+            "Llama Score": llama,
+            "Candidate ID": cid,
+            "Application ID": uid(),
+            "Resume File": f"{cid}.pdf",
+            "Llama Summary": _text(rng, text_chars),
+            "Gemini Summary": _text(rng, text_chars),
+            "Gemini Score": gemini,
+            "avg_score": (llama + gemini) / 2,
+            "Note": rng.choice(["", "Below threshold", "Strong fit"]),
+            "candidate_id": cid,
+            "location": rng.choice(LOCATIONS),
+            "education": rng.choice(EDUCATION),
+            "job_id": rng.choice(job_ids),
+            "application_date": f"2025-04-{rng.randint(1, 28):02d}",
+            "source": rng.choice(SOURCES),
+            "onboarding_docs": {
+                "offer_letter": _text(rng, text_chars * 4 // 3),
+                "contract": _text(rng, text_chars * 4 // 3),
+            },
+        }
+
+    employees = {
+        uid(): {"llama_profile": _text(rng, 3400), "gemini_profile": _text(rng, 4000)}
+        for _ in range(n_employees)
+    }
+    return {"jobs": jobs, "candidates": candidates, "employees": employees, "team_summary": _text(rng, 3000)}
+
+
+def _timed(fn, runs=1):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _result(backend, size, operation, times):
+    ordered = sorted(times)
+    return {
+        "backend": backend,
+        "candidates": size,
+        "operation": operation,
+        "runs": len(times),
+        "total_s": round(sum(times), 6),
+        "mean_ms": round(statistics.mean(times) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+    }
+
+
+def run_backend(backend, data, workdir, runs=50, seed=0):
+    """Time the context API on one backend. Returns a list of result dicts."""
+    rng = random.Random(seed)
+    size = len(data["candidates"])
+    path = os.path.join(workdir, f"{backend}_{size}", "mcp_context.db" if backend == "sqlite" else "mcp_context.json")
+    os.makedirs(os.path.dirname(path))
+    context.set_backend(backend, path)
+    context.init_context()
+
+    results = []
+
+    def result(operation, times):
+        results.append(_result(backend, size, operation, times))
+
+    def populate():
+        with context.transaction():
+            for job_id, job in data["jobs"].items():
+                context.save_job_context(job_id, job)
+            for employee_id, employee in data["employees"].items():
+                context.save_employee_context(employee_id, employee)
+            context.save_team_summary(data["team_summary"])
+        context.bulk_save_candidates(data["candidates"])
+
+    result("bulk_save", _timed(populate))
+
+    cids = list(data["candidates"])
+    job_ids = list(data["jobs"])
+
+    def single_save():
+        cid = rng.choice(cids)
+        context.update_candidate_context(cid, lambda c: c.update(Note=f"Reviewed {time.time()}"), hydrate=False)
+
+    result("single_save", _timed(single_save, runs))
+    result("job_lookup", _timed(lambda: context.get_candidates_for_job(rng.choice(job_ids)), runs))
+    result("candidate_read", _timed(lambda: context.get_candidate_context(rng.choice(cids)), runs))
+    result("full_scan", _timed(lambda: sum(c.get("avg_score", 0) for c in context.get_all_candidates().values()), 5))
+
+    def cold_start():
+        context.set_backend(backend, path)
+        context.get_all_candidates()
+
+    result("cold_start", _timed(cold_start, 3))
+    return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the context store backends on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Candidate counts to test")
+    parser.add_argument("--backends", nargs="+", default=["json", "journal", "sqlite"], help="Storage backends to test")
+    parser.add_argument("--runs", type=int, default=50, help="Repetitions for the per-record operations")
+    parser.add_argument("--text-chars", type=int, default=2600, help="Length of each generated LLM summary")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="context_bench_")
+    # Registered first so it runs last, after the journal store's exit-time compaction
+    atexit.register(shutil.rmtree, workdir, True)
+
+    results = []
+    for size in args.sizes:
+        data = generate_context(size, text_chars=args.text_chars, seed=args.seed)
+        for backend in args.backends:
+            print(f"⏱️ {backend}: {size} candidates", file=sys.stderr)
+            for row in run_backend(backend, data, workdir, runs=args.runs, seed=args.seed):
+                results.append(row)
+                print(f"   {row['operation']:<15} mean {row['mean_ms']:>10.3f} ms   p95 {row['p95_ms']:>10.3f} ms", file=sys.stderr)
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
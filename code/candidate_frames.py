@@ -0,0 +1,82 @@
+import ast
+import threading
+
+import numpy as np
+import pandas as pd
+
+from context import BLOB_FIELDS, get_candidates_for_job
+
+# Columns the analytics tabs treat as numbers; anything unparsable ("N/A", None) becomes NaN
+NUMERIC_FIELDS = ("Years of Experience", "Llama Score", "Gemini Score", "avg_score")
+LIST_FIELDS = ("Key Skills",)
+
+# Long LLM text never makes it into the frame; the analytics tabs drop it anyway
+SKIPPED_FIELDS = set(BLOB_FIELDS["candidates"])
+
+_lock = threading.Lock()
+_partitions = {}  # job_id -> (records, DataFrame)
+_rows = {}  # candidate_id -> (record, typed row)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _skills(value):
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return [s.strip() for s in value.split(",") if s.strip()]
+    return list(value) if isinstance(value, (list, tuple)) else []
+
+
+def _typed_row(record):
+    row = {k: v for k, v in record.items() if k not in SKIPPED_FIELDS}
+    for field in NUMERIC_FIELDS:
+        if field in row:
+            row[field] = _number(row[field])
+    for field in LIST_FIELDS:
+        if field in row:
+            row[field] = _skills(row[field])
+    return row
+
+
+def _row(cid, record):
+    # Context records are immutable and replaced on save, so identity tells us whether to re-parse
+    cached = _rows.get(cid)
+    if cached is None or cached[0] is not record:
+        cached = _rows[cid] = (record, _typed_row(record))
+    return cached[1]
+
+
+def get_candidate_frame(job_id):
+    """
+    Typed DataFrame of one job's candidates, shared by every session.
+
+    Numeric fields are float64 (NaN when missing) and Key Skills is a list. The frame is
+    rebuilt only when a candidate of this job changes, and only changed rows are re-parsed.
+    Treat it as read-only: copy before adding or overwriting columns.
+    """
+    records = get_candidates_for_job(job_id)
+    with _lock:
+        cached = _partitions.get(job_id)
+        if cached is not None and cached[0].keys() == records.keys() and all(
+            cached[0][cid] is record for cid, record in records.items()
+        ):
+            return cached[1]
+
+        stale = set(cached[0]) - set(records) if cached is not None else ()
+        for cid in stale:
+            _rows.pop(cid, None)
+
+        df = pd.DataFrame([_row(cid, record) for cid, record in records.items()])
+        for field in NUMERIC_FIELDS:
+            if field in df.columns:
+                df[field] = df[field].astype("float64")
+        _partitions[job_id] = (records, df)
+        return df
+
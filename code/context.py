@@ -1,91 +1,449 @@
+import contextlib
+import functools
+import hashlib
 import json
 import os
+import threading
+
+from context_store import SECTIONS, ContextConflictError, make_store
 
 CONTEXT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "milestone2", "data", "mcp_context.json"))
+CONTEXT_DB_PATH = os.getenv("CONTEXT_DB_PATH", os.path.splitext(CONTEXT_PATH)[0] + ".db")
+
+# "json" keeps the single mcp_context.json file, "journal" appends deltas next to it and
+# compacts them in the background, "sqlite" upserts one row per record
+CONTEXT_BACKEND = os.getenv("CONTEXT_BACKEND", "json")
+
+# Long LLM outputs live in separate blobs; the record only keeps {"$blob": key}.
+# Collection reads hand out the references, views that display the text hydrate them.
+BLOB_FIELDS = {
+    "candidates": ("Llama Summary", "Gemini Summary", "onboarding_docs"),
+    "employees": ("llama_profile", "gemini_profile"),
+}
+BLOB_MIN_CHARS = 256
+
+_store = None
+
+# Process-wide read-only copy of the store. Own writes are applied to it directly;
+# it is only reloaded when the store token says someone else changed the data.
+_cache_lock = threading.RLock()
+_snapshot = None
+_snapshot_token = None
+_job_index = None  # job_id -> {candidate_id: None}, kept in step with _snapshot
+
+# Writes buffered by an open transaction() on this thread
+_tx = threading.local()
+
+# Change listeners, see subscribe()
+_subscribers = []
+
+
+class FrozenDict(dict):
+    """Read-only dict handed out by the context cache. Use the save_* functions to change data."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Context snapshot is read-only; copy it or use the save_* functions")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class FrozenList(list):
+    """Read-only list handed out by the context cache."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Context snapshot is read-only; copy it or use the save_* functions")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return FrozenList(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, dict):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def get_store():
+    global _store
+    if _store is None:
+        path = CONTEXT_DB_PATH if CONTEXT_BACKEND == "sqlite" else CONTEXT_PATH
+        _store = make_store(CONTEXT_BACKEND, path)
+    return _store
+
+
+def set_backend(backend, path=None):
+    """Switch the storage engine used by every function in this module."""
+    global _store, CONTEXT_BACKEND
+    if path is None:
+        path = CONTEXT_DB_PATH if backend == "sqlite" else CONTEXT_PATH
+    with _cache_lock:
+        _store = make_store(backend, path)
+        CONTEXT_BACKEND = backend
+        invalidate_cache()
+        _blob_value.cache_clear()
+    return _store
+
+
+def invalidate_cache():
+    """Drop the cached snapshot so the next read goes back to the store."""
+    global _snapshot, _snapshot_token, _job_index
+    with _cache_lock:
+        _snapshot = None
+        _snapshot_token = None
+        _job_index = None
+
+
+def _read():
+    global _snapshot, _snapshot_token, _job_index
+    store = get_store()
+    reloaded = False
+    with _cache_lock:
+        token = store.token()
+        if _snapshot is None or token != _snapshot_token:
+            reloaded = _snapshot_token is not None and token != _snapshot_token
+            _snapshot = _freeze(store.load())
+            _snapshot_token = token
+            _job_index = _index_candidates(_snapshot["candidates"])
+        snapshot = _snapshot
+    if reloaded:
+        _publish([{"op": "reload"}])
+    return snapshot
+
+
+def _write(records):
+    """Apply records to the store, then patch the snapshot if nobody else changed the store meanwhile."""
+    global _snapshot, _job_index
+    store = get_store()
+    blobs = {}
+    for record in records:
+        blobs.update(record.pop("blobs", None) or {})
+    # Blobs go first, all in one durable write, so a saved record never points at a missing blob
+    written = store.put_blobs(blobs) if blobs else []
+    # The records about to be replaced, to find the blobs they leave behind
+    replaces_blobs = any(r["op"] == "put" and r["section"] in BLOB_FIELDS for r in records)
+    previous = _read() if replaces_blobs else None
+    with _cache_lock:
+        before = store.token()
+        try:
+            store.apply_batch(records)
+        except BaseException:
+            store.delete_blobs(written)
+            raise
+        external = _snapshot_token is not None and before != _snapshot_token
+        if _snapshot is not None and _snapshot_token == before == store.token():
+            _snapshot = _patched(_snapshot, records)
+        else:
+            _snapshot = None
+            _job_index = None
+    _drop_unused_blobs(previous, records, written)
+    changes = [{k: r[k] for k in ("op", "section", "key") if k in r} for r in records]
+    _publish(changes + [{"op": "reload"}] if external else changes)
+
+
+def subscribe(callback):
+    """
+    Call `callback(changes)` after every write made through this module.
+
+    `changes` is a list of {"op": "put", "section": ..., "key": ...}, {"op": "meta", "key": ...},
+    {"op": "clear"} or {"op": "reload"} (another process changed the store). Callbacks run on the
+    writing thread, after the write is durable. Returns a function that unsubscribes.
+    """
+    _subscribers.append(callback)
+    return lambda: _subscribers.remove(callback)
+
+
+def _publish(changes):
+    for callback in list(_subscribers):
+        try:
+            callback(changes)
+        except Exception as e:
+            print(f"❌ Context change listener failed: {e}")
+
+
+def _patched(snapshot, records):
+    updated = dict(snapshot)
+    copied = set()
+    for record in records:
+        op = record["op"]
+        if op == "put":
+            section, key = record["section"], record["key"]
+            if section not in copied:
+                updated[section] = FrozenDict(updated[section])
+                copied.add(section)
+            if section == "candidates":
+                _reindex_candidate(key, updated[section].get(key), record["value"])
+            dict.__setitem__(updated[section], key, _freeze(record["value"]))
+        elif op == "meta":
+            updated[record["key"]] = _freeze(record["value"])
+        elif op == "clear":
+            _job_index.clear()
+            updated = {section: FrozenDict() for section in SECTIONS}
+            copied = set(SECTIONS)
+    return FrozenDict(updated)
+
+
+def _submit(record):
+    if getattr(_tx, "records", None) is not None:
+        _tx.records.append(record)
+    else:
+        _write([record])
+
+
+@contextlib.contextmanager
+def transaction():
+    """
+    Buffer every save in the block and apply them atomically with one durable write on exit.
+
+    Reads inside the block do not see the buffered saves. If the block raises, nothing is written.
+    Nested transactions join the outer one.
+    """
+    if getattr(_tx, "records", None) is not None:
+        yield
+        return
+    _tx.records = []
+    try:
+        yield
+        records = _tx.records
+    finally:
+        _tx.records = None
+    if records:
+        _write(records)
+
+
+def _index_candidates(candidates):
+    index = {}
+    for candidate_id, candidate in candidates.items():
+        job_id = candidate.get("job_id")
+        if job_id:
+            index.setdefault(job_id, {})[candidate_id] = None
+    return index
+
+
+def _reindex_candidate(candidate_id, old, new):
+    old_job = old.get("job_id") if old else None
+    new_job = new.get("job_id") if new else None
+    if old_job == new_job:
+        return
+    if old_job and old_job in _job_index:
+        _job_index[old_job].pop(candidate_id, None)
+        if not _job_index[old_job]:
+            del _job_index[old_job]
+    if new_job:
+        _job_index.setdefault(new_job, {})[candidate_id] = None
+
+
+def is_blob_ref(value):
+    return isinstance(value, dict) and len(value) == 1 and "$blob" in value
+
+
+def _externalize(section, value, blobs):
+    # Long fields are replaced by references; their payloads are collected in `blobs` for _write
+    fields = BLOB_FIELDS.get(section)
+    if not fields or not isinstance(value, dict):
+        return value
+    record = dict(value)
+    for field in fields:
+        if field not in record or is_blob_ref(record[field]):
+            continue
+        payload = json.dumps(record[field])
+        if len(payload) >= BLOB_MIN_CHARS:
+            key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            blobs[key] = payload
+            record[field] = {"$blob": key}
+    return record
+
+
+def _blob_keys(section, record):
+    if not isinstance(record, dict):
+        return set()
+    return {record[f]["$blob"] for f in BLOB_FIELDS.get(section, ()) if is_blob_ref(record.get(f))}
+
+
+def _referenced_blobs(snapshot):
+    return {key for section in BLOB_FIELDS for record in snapshot[section].values() for key in _blob_keys(section, record)}
+
+
+def _drop_unused_blobs(previous, records, written):
+    """Delete the blobs that the write left without a record: replaced text and, after a clear, all of them."""
+    if any(record["op"] == "clear" for record in records):
+        collect_blobs()
+        return
+    final = {(r["section"], r["key"]): r["value"] for r in records if r["op"] == "put"}
+    candidates = set(written)  # e.g. overwritten again later in the same transaction
+    if previous is not None:
+        for section, key in final:
+            candidates |= _blob_keys(section, previous[section].get(key))
+    for (section, _), value in final.items():
+        candidates -= _blob_keys(section, value)
+    if candidates:
+        # Content-addressed: identical text saved on another record shares the blob
+        candidates -= _referenced_blobs(_read())
+    if candidates:
+        get_store().delete_blobs(candidates)
+
+
+@functools.lru_cache(maxsize=512)
+def _blob_value(store, key):
+    # Blobs are content-addressed, so a cached value can never go stale
+    return _freeze(json.loads(store.get_blob(key)))
+
+
+def _hydrate(record):
+    if not any(is_blob_ref(v) for v in record.values()):
+        return record
+    store = get_store()
+    return FrozenDict((k, _blob_value(store, v["$blob"]) if is_blob_ref(v) else v) for k, v in record.items())
+
+
+def _record(section, key, hydrate):
+    record = _read()[section].get(key, {})
+    return _hydrate(record) if hydrate else record
+
+
+def _records(records, hydrate):
+    return FrozenDict((k, _hydrate(v)) for k, v in records.items()) if hydrate else records
+
+
+def _put(section, key, value):
+    # Copy now: inside a transaction the caller may keep mutating `value` before the commit
+    blobs = {}
+    record = {"op": "put", "section": section, "key": key, "value": _thaw(_externalize(section, value, blobs))}
+    if blobs:
+        record["blobs"] = blobs
+    # Records read through this module carry `_version`; saving one back is a compare-and-swap
+    if isinstance(value, dict) and "_version" in value:
+        record["expected_version"] = value["_version"]
+    _submit(record)
+
+
+def _update(section, key, update, hydrate, retries):
+    for attempt in range(retries + 1):
+        record = _thaw(_record(section, key, hydrate))
+        record.setdefault("_version", 0)
+        update(record)
+        try:
+            _put(section, key, record)
+            return record
+        except ContextConflictError as e:
+            if attempt == retries:
+                raise
+            print(f"⚠️ {e}; retrying ({attempt + 1}/{retries})")
+
 
 def init_context():
-    if not os.path.exists("data"):
-        os.makedirs("data")
-    if not os.path.exists(CONTEXT_PATH):
-        with open(CONTEXT_PATH, "w") as f:
-            json.dump({"jobs": {}, "candidates": {}, 'employees': {}}, f)
+    get_store().init()
 
 def load_context():
-    with open(CONTEXT_PATH, "r") as f:
-        return json.load(f)
+    """Read-only snapshot of the whole store; large text fields are left as blob references."""
+    return _read()
 
 def save_job_context(job_id, job_data):
-    init_context()
-    context = load_context()
-    context["jobs"][job_id] = job_data
-    with open(CONTEXT_PATH, "w") as f:
-        json.dump(context, f, indent=2)
+    _put("jobs", job_id, job_data)
 
 def save_candidate_context(candidate_id, candidate_data):
-    init_context()
-    context = load_context()
-    context["candidates"][candidate_id] = candidate_data
-    with open(CONTEXT_PATH, "w") as f:
-        json.dump(context, f, indent=2)
+    _put("candidates", candidate_id, candidate_data)
+
+def update_candidate_context(candidate_id, update, hydrate=True, retries=3):
+    """
+    Read-modify-write one candidate safely against concurrent saves.
+
+    `update(ctx)` mutates a fresh copy in place; on a version conflict it is re-run against the
+    newer record, and ContextConflictError is raised once `retries` is exhausted.
+    """
+    return _update("candidates", candidate_id, update, hydrate, retries)
+
+def update_job_context(job_id, update, retries=3):
+    return _update("jobs", job_id, update, False, retries)
 
 def get_job_context(job_id):
-    context = load_context()
-    return context["jobs"].get(job_id, {})
+    return _thaw(_record("jobs", job_id, False))
 
-def get_candidate_context(candidate_id):
-    context = load_context()
-    return context["candidates"].get(candidate_id, {})
+def get_candidate_context(candidate_id, hydrate=True):
+    """Private copy of one candidate. Pass hydrate=False when the long LLM texts are not needed."""
+    return _thaw(_record("candidates", candidate_id, hydrate))
 
 def get_all_jobs():
-    return load_context()["jobs"]
+    return _read()["jobs"]
+
+def get_all_candidates(hydrate=False):
+    return _records(_read()["candidates"], hydrate)
 
-def get_all_candidates():
-    return load_context()["candidates"]
+def bulk_save_candidates(candidates):
+    """Save {candidate_id: candidate_data} in one transaction (one durable write for the whole batch)."""
+    with transaction():
+        for candidate_id, candidate_data in candidates.items():
+            save_candidate_context(candidate_id, candidate_data)
+
+def get_candidates_for_job(job_id, hydrate=False):
+    """Read-only {candidate_id: record} for one job, served from the job_id index."""
+    with _cache_lock:
+        candidates = _read()["candidates"]
+        records = FrozenDict((cid, candidates[cid]) for cid in _job_index.get(job_id, ()))
+    return _records(records, hydrate)
+
+def get_job_ids_with_candidates():
+    with _cache_lock:
+        _read()
+        return frozenset(_job_index)
 
 def save_employee_context(employee_id, employee_data):
-    init_context()
-    context = load_context()
-    context["employees"][employee_id] = employee_data
-    with open(CONTEXT_PATH, "w") as f:
-        json.dump(context, f, indent=2)
+    _put("employees", employee_id, employee_data)
 
-def get_employee_context(employee_id):
-    context = load_context()
-    return context["employees"].get(employee_id, {})
+def get_employee_context(employee_id, hydrate=True):
+    return _thaw(_record("employees", employee_id, hydrate))
 
-def get_all_employees():
-    return load_context()["employees"]
+def get_all_employees(hydrate=False):
+    return _records(_read()["employees"], hydrate)
 
 def clear_context():
-    """Forcefully clears all saved job and candidate data in the context file."""
-    if not os.path.exists("data"):
-        os.makedirs("data")
-    with open(CONTEXT_PATH, "w") as f:
-        json.dump({"jobs": {}, "candidates": {}, 'employees': {}}, f, indent=2)
+    """Forcefully clears all saved job and candidate data in the context file, and their blobs."""
+    _submit({"op": "clear"})
 
 def save_team_summary(summary_text):
-    init_context()
-    context = load_context()
-    context["team_summary"] = summary_text
-    with open(CONTEXT_PATH, "w") as f:
-        json.dump(context, f, indent=2)
+    _submit({"op": "meta", "key": "team_summary", "value": summary_text})
 
 def get_team_summary():
-    context = load_context()
-    return context.get("team_summary", "")
+    return _read().get("team_summary", "")
 
 def save_candidate_offer(candidate_id, offer_text):
-    init_context()
-    context = load_context()
-    candidate = context["candidates"].get(candidate_id, {})
-    if "onboarding_docs" not in candidate:
-        candidate["onboarding_docs"] = {}
-    candidate["onboarding_docs"]["offer_letter"] = offer_text
-    context["candidates"][candidate_id] = candidate
-    with open(CONTEXT_PATH, "w") as f:
-        json.dump(context, f, indent=2)
+    update_candidate_context(
+        candidate_id, lambda candidate: candidate.setdefault("onboarding_docs", {}).update(offer_letter=offer_text)
+    )
 
 def get_candidate_offer(candidate_id):
-    context = load_context()
-    return context["candidates"].get(candidate_id, {}).get("onboarding_docs", {}).get("offer_letter", "")
+    return _record("candidates", candidate_id, True).get("onboarding_docs", {}).get("offer_letter", "")
+
+def migrate_blobs():
+    """One-shot: move inline long text fields of existing records into blobs. Returns the number of records rewritten."""
+    rewritten = 0
+    with transaction():
+        for section, fields in BLOB_FIELDS.items():
+            for key, record in _read()[section].items():
+                inline = [f for f in fields if f in record and not is_blob_ref(record[f])]
+                if any(len(json.dumps(record[f])) >= BLOB_MIN_CHARS for f in inline):
+                    _put(section, key, _thaw(record))
+                    rewritten += 1
+    return rewritten
+
+def collect_blobs():
+    """
+    Delete blobs that no record points at. Returns the number deleted.
 
+    Saves and clear_context() already clean up after themselves; this catches blobs left behind
+    by older versions or crashed writers. Run it while no other process is saving.
+    """
+    store = get_store()
+    unused = set(store.blob_keys()) - _referenced_blobs(_read())
+    store.delete_blobs(unused)
+    return len(unused)
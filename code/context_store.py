@@ -0,0 +1,642 @@
+import atexit
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+SECTIONS = ("jobs", "candidates", "employees")
+
+
+class ContextConflictError(RuntimeError):
+    """A save carried a `_version` that no longer matches the stored record."""
+
+    def __init__(self, section, key, expected, actual):
+        super().__init__(
+            f"Context: {section}/{key} was changed by someone else "
+            f"(saving over version {expected}, stored version is {actual})"
+        )
+        self.section = section
+        self.key = key
+        self.expected = expected
+        self.actual = actual
+
+
+def empty_context():
+    return {"jobs": {}, "candidates": {}, "employees": {}}
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _atomic_write(path, payload, fsync=True):
+    """Write `payload` to a temp file next to `path`, fsync it, then rename it over `path`."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class FileLock:
+    """Re-entrant exclusive lock shared by threads in this process and, via flock, by other processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+
+def _sync_files(paths):
+    """Flush freshly written files to disk: one sync() for the lot where the OS has it, else fsync each."""
+    if hasattr(os, "sync"):
+        os.sync()
+        return
+    for path in paths:
+        with open(path, "a") as f:
+            os.fsync(f.fileno())
+
+
+class _BlobFiles:
+    """Content-addressed blob files kept in a directory next to the JSON snapshot."""
+
+    def _blob_dir(self):
+        return os.path.splitext(self.path)[0] + "_blobs"
+
+    def _blob_path(self, key):
+        return os.path.join(self._blob_dir(), key[:2], key + ".json")
+
+    def put_blobs(self, blobs):
+        """Write the {key: payload} blobs that don't exist yet, durably. Returns the keys written."""
+        written = []
+        for key, payload in blobs.items():
+            path = self._blob_path(key)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _atomic_write(path, payload, fsync=False)
+                written.append(key)
+        if written:
+            _sync_files([self._blob_path(key) for key in written])
+        return written
+
+    def get_blob(self, key):
+        with open(self._blob_path(key), "r") as f:
+            return f.read()
+
+    def blob_keys(self):
+        keys = []
+        for _, _, files in os.walk(self._blob_dir()):
+            keys += [name[:-5] for name in files if name.endswith(".json") and not name.startswith(".tmp-")]
+        return keys
+
+    def delete_blobs(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._blob_path(key))
+            except FileNotFoundError:
+                pass
+
+
+class JSONContextStore(_BlobFiles):
+    """Whole-file store: every write re-serializes the full mcp_context.json."""
+
+    name = "json"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + ".lock")  # writers, across processes
+        self._seen = None  # stat of the file as this store last saw or wrote it
+        self._generation = 0
+
+    def token(self):
+        """Changes only when the file was modified by someone other than this store."""
+        with self._lock:
+            stat = _stat(self.path)
+            if stat != self._seen:
+                self._seen = stat
+                self._generation += 1
+            return self._generation
+
+    def init(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if not os.path.exists(self.path):
+            self._write(empty_context())
+
+    def load(self):
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def get(self, section, key):
+        return self.load()[section].get(key)
+
+    def all(self, section):
+        return self.load()[section]
+
+    def get_meta(self, key, default=None):
+        return self.load().get(key, default)
+
+    def put(self, section, key, value):
+        self.apply_batch([{"op": "put", "section": section, "key": key, "value": value}])
+
+    def set_meta(self, key, value):
+        self.apply_batch([{"op": "meta", "key": key, "value": value}])
+
+    def clear(self):
+        self.apply_batch([{"op": "clear"}])
+
+    def apply_batch(self, records):
+        """Apply a list of put/meta/clear records with a single rewrite of the file."""
+        with self._file_lock, self._lock:
+            self.init()
+            self.token()
+            context = self.load()
+            _stamp_versions(records, lambda section, key: _version_of(context[section].get(key)))
+            for record in records:
+                _apply_record(context, record)
+            self._write(context)
+
+    def _write(self, context):
+        _atomic_write(self.path, json.dumps(context, indent=2))
+        self._seen = _stat(self.path)
+
+
+def _version_of(record):
+    return (record or {}).get("_version", 0)
+
+
+def _stamp_versions(records, current_version):
+    """
+    Compare-and-swap check for a batch, run under the store's write lock before anything is written.
+
+    A put carrying `expected_version` must match the stored record's `_version`; every put is then
+    stamped with the next version. `current_version(section, key)` reads the stored version.
+    """
+    versions = {}
+    cleared = False
+    for record in records:
+        if record["op"] == "clear":
+            versions.clear()
+            cleared = True
+        elif record["op"] == "put":
+            ident = (record["section"], record["key"])
+            if ident in versions:
+                version = versions[ident]
+            else:
+                version = 0 if cleared else current_version(*ident)
+            expected = record.pop("expected_version", None)
+            if expected is not None and expected != version:
+                raise ContextConflictError(record["section"], record["key"], expected, version)
+            versions[ident] = version + 1
+            record["value"] = dict(record["value"], _version=version + 1)
+
+
+def _apply_record(context, record):
+    op = record["op"]
+    if op == "batch":
+        for item in record["records"]:
+            _apply_record(context, item)
+    elif op == "put":
+        _check_section(record["section"])
+        context[record["section"]][record["key"]] = record["value"]
+    elif op == "meta":
+        context[record["key"]] = record["value"]
+    elif op == "clear":
+        context.clear()
+        context.update(empty_context())
+    else:
+        raise ValueError(f"Context: unknown journal op '{op}'")
+
+
+class JournalContextStore(_BlobFiles):
+    """
+    Write-ahead journal on top of mcp_context.json.
+
+    Each save appends one delta line to `<path>.journal` (fsync'd), so write cost follows the
+    size of the changed record. Readers replay the journal over the last snapshot, and a
+    background thread periodically folds the journal into a new snapshot via atomic rename.
+    """
+
+    name = "journal"
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_interval = float(os.getenv("CONTEXT_COMPACT_INTERVAL", "30"))
+        self.compact_records = int(os.getenv("CONTEXT_COMPACT_RECORDS", "500"))
+        self._lock = FileLock(path + ".lock")  # writers and the compactor, across processes
+        self._mutex = threading.RLock()  # in-memory state
+        self._state = None
+        self._snapshot_stat = None
+        self._offset = 0  # bytes of the journal already applied to _state
+        self._pending = 0  # journal records not yet folded into the snapshot
+        self._generation = 0
+        self._wakeup = threading.Event()
+        self._compactor = None
+
+    def init(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if not os.path.exists(self.path):
+                _atomic_write(self.path, json.dumps(empty_context(), indent=2))
+
+    def token(self):
+        """Changes only when another process appended to the journal or compacted it."""
+        with self._mutex:
+            self._catch_up()
+            return self._generation
+
+    def load(self):
+        # Returned as-is: callers (the context cache) copy it before handing it out
+        with self._mutex:
+            self._catch_up()
+            return self._state
+
+    def get(self, section, key):
+        return copy.deepcopy(self.load()[section].get(key))
+
+    def all(self, section):
+        return copy.deepcopy(self.load()[section])
+
+    def get_meta(self, key, default=None):
+        return copy.deepcopy(self.load().get(key, default))
+
+    def put(self, section, key, value):
+        self.apply_batch([{"op": "put", "section": section, "key": key, "value": value}])
+
+    def set_meta(self, key, value):
+        self.apply_batch([{"op": "meta", "key": key, "value": value}])
+
+    def clear(self):
+        self.apply_batch([{"op": "clear"}])
+
+    def apply_batch(self, records):
+        """Append the records as one journal line, so a crash keeps all of them or none."""
+        with self._lock:
+            self.init()
+            with self._mutex:
+                self._catch_up()
+                _stamp_versions(records, lambda section, key: _version_of(self._state[section].get(key)))
+                self._append(records[0] if len(records) == 1 else {"op": "batch", "records": records})
+        self._start_compactor()
+        if self._pending >= self.compact_records:
+            self._wakeup.set()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot. Returns False when there was nothing to fold."""
+        with self._lock:
+            with self._mutex:
+                self._catch_up()
+                if not self._pending:
+                    return False
+                payload = json.dumps(self._state, indent=2)
+            # No writer can append while we hold the file lock, so the state cannot move underneath us
+            _atomic_write(self.path, payload)
+            with self._mutex:
+                with open(self.journal_path, "wb"):
+                    pass
+                self._snapshot_stat = _stat(self.path)
+                self._offset = 0
+                self._pending = 0
+        return True
+
+    def _append(self, record):
+        # Caller holds the file lock and the mutex, and has caught up with the journal
+        data = (json.dumps(record) + "\n").encode("utf-8")
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > self._offset:
+            # Torn tail from a crashed writer: start a fresh line so it stays a single bad record
+            data = b"\n" + data
+        with open(self.journal_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+        # Apply a decoded copy so later mutations by the caller cannot leak into the state
+        _apply_record(self._state, json.loads(data.strip()))
+        self._pending += 1
+
+    def _catch_up(self):
+        if self._state is None or _stat(self.path) != self._snapshot_stat:
+            self._reload()
+            return
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._offset:
+            self._reload()
+        elif size > self._offset and self._replay():
+            self._generation += 1
+
+    def _reload(self):
+        # A compaction elsewhere may swap the snapshot and truncate the journal while we read;
+        # if the snapshot changed underneath us, read both again.
+        while True:
+            stat = _stat(self.path)
+            if stat is None:
+                self._state = empty_context()
+            else:
+                with open(self.path, "r") as f:
+                    self._state = json.load(f)
+            self._offset = 0
+            self._pending = 0
+            self._replay()
+            if _stat(self.path) == stat:
+                break
+        self._snapshot_stat = stat
+        self._generation += 1
+
+    def _replay(self):
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+
+        # Only whole lines: a trailing partial line is a write still in flight (or a torn one)
+        end = data.rfind(b"\n") + 1
+        applied = 0
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Skipping corrupt context journal record in {self.journal_path}")
+                continue
+            _apply_record(self._state, record)
+            applied += 1
+        self._offset += end
+        self._pending += applied
+        return applied
+
+    def _start_compactor(self):
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_loop, name="context-compactor", daemon=True)
+            self._compactor.start()
+            atexit.register(self._compact_quietly)
+
+    def _compact_loop(self):
+        while True:
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            self._compact_quietly()
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"❌ Context compaction failed: {e}")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS candidates (id TEXT PRIMARY KEY, job_id TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS candidates_job_id ON candidates (job_id);
+CREATE TABLE IF NOT EXISTS employees (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, body TEXT NOT NULL);
+"""
+
+
+class SQLiteContextStore:
+    """Embedded SQLite store: one row per job, candidate and employee, upserted individually."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def init(self):
+        with self._lock:
+            self._connect()
+
+    def token(self):
+        """SQLite's data_version only moves when another connection commits."""
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self):
+        context = empty_context()
+        with self._lock:
+            conn = self._connect()
+            for section in SECTIONS:
+                context[section] = {k: json.loads(v) for k, v in conn.execute(f"SELECT id, data FROM {section}")}
+            for key, value in conn.execute("SELECT key, value FROM meta"):
+                context[key] = json.loads(value)
+        return context
+
+    def get(self, section, key):
+        _check_section(section)
+        with self._lock:
+            return self._get(self._connect(), section, key)
+
+    def _get(self, conn, section, key):
+        _check_section(section)
+        row = conn.execute(f"SELECT data FROM {section} WHERE id = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all(self, section):
+        _check_section(section)
+        with self._lock:
+            rows = self._connect().execute(f"SELECT id, data FROM {section}").fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, section, key, value):
+        self.apply_batch([{"op": "put", "section": section, "key": key, "value": value}])
+
+    def set_meta(self, key, value):
+        self.apply_batch([{"op": "meta", "key": key, "value": value}])
+
+    def apply_batch(self, records):
+        """Apply a list of put/meta/clear records in one SQLite transaction."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                # Take the write lock up front so the version check and the upserts are atomic across processes
+                conn.execute("BEGIN IMMEDIATE")
+                _stamp_versions(records, lambda section, key: _version_of(self._get(conn, section, key)))
+                for record in records:
+                    self._apply(conn, record)
+
+    def _apply(self, conn, record):
+        op = record["op"]
+        if op == "batch":
+            for item in record["records"]:
+                self._apply(conn, item)
+        elif op == "put":
+            _check_section(record["section"])
+            self._upsert(conn, record["section"], record["key"], record["value"])
+        elif op == "meta":
+            self._upsert_meta(conn, record["key"], record["value"])
+        elif op == "clear":
+            for table in SECTIONS + ("meta",):
+                conn.execute(f"DELETE FROM {table}")
+        else:
+            raise ValueError(f"Context: unknown journal op '{op}'")
+
+    def put_blobs(self, blobs):
+        """Insert the {key: payload} blobs that don't exist yet in one transaction. Returns the keys written."""
+        written = []
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for key, payload in blobs.items():
+                    if conn.execute("INSERT OR IGNORE INTO blobs (key, body) VALUES (?, ?)", (key, payload)).rowcount:
+                        written.append(key)
+        return written
+
+    def get_blob(self, key):
+        with self._lock:
+            row = self._connect().execute("SELECT body FROM blobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(f"Context: missing blob {key}")
+        return row[0]
+
+    def blob_keys(self):
+        with self._lock:
+            return [key for (key,) in self._connect().execute("SELECT key FROM blobs")]
+
+    def delete_blobs(self, keys):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("DELETE FROM blobs WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self):
+        self.apply_batch([{"op": "clear"}])
+
+    def _upsert(self, conn, section, key, value):
+        data = json.dumps(value)
+        if section == "candidates":
+            conn.execute(
+                "INSERT INTO candidates (id, job_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET job_id = excluded.job_id, data = excluded.data",
+                (key, value.get("job_id"), data),
+            )
+        else:
+            conn.execute(
+                f"INSERT INTO {section} (id, data) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                (key, data),
+            )
+
+    def _upsert_meta(self, conn, key, value):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+
+def _check_section(section):
+    if section not in SECTIONS:
+        raise ValueError(f"Context: unknown section '{section}'")
+
+
+BACKENDS = {
+    "json": JSONContextStore,
+    "journal": JournalContextStore,
+    "sqlite": SQLiteContextStore,
+}
+
+
+def make_store(backend, path):
+    if backend not in BACKENDS:
+        raise ValueError(f"Context: unknown storage backend '{backend}'")
+    return BACKENDS[backend](path)
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """One-shot import of an existing mcp_context.json into a SQLite store. Returns row counts."""
+    with open(json_path, "r") as f:
+        context = json.load(f)
+
+    store = SQLiteContextStore(db_path)
+    with store._lock:
+        conn = store._connect()
+        with conn:
+            for section in SECTIONS:
+                for key, value in context.get(section, {}).items():
+                    store._upsert(conn, section, key, value)
+            for key, value in context.items():
+                if key not in SECTIONS:
+                    store._upsert_meta(conn, key, value)
+            blob_dir = os.path.splitext(json_path)[0] + "_blobs"
+            for root, _, files in os.walk(blob_dir):
+                for name in files:
+                    with open(os.path.join(root, name), "r") as f:
+                        conn.execute(
+                            "INSERT OR IGNORE INTO blobs (key, body) VALUES (?, ?)",
+                            (os.path.splitext(name)[0], f.read()),
+                        )
+    return {section: len(context.get(section, {})) for section in SECTIONS}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from context import CONTEXT_DB_PATH, CONTEXT_PATH
+
+    parser = argparse.ArgumentParser(description="Migrate mcp_context.json into the SQLite context store.")
+    parser.add_argument("--json", default=CONTEXT_PATH, help="Source JSON context file")
+    parser.add_argument("--db", default=CONTEXT_DB_PATH, help="Target SQLite database")
+    args = parser.parse_args()
+
+    counts = migrate_json_to_sqlite(args.json, args.db)
+    print(f"✅ Migrated {counts} into {args.db}")
+    print("Set CONTEXT_BACKEND=sqlite to use it.")
@@ -0,0 +1,94 @@
+import hashlib
+import json
+
+from context import get_job_context, get_team_summary, update_job_context
+from llm_connect import get_response
+from single_flight import SingleFlight
+
+BRIEF_VERSION = 1  # bump when the prompt below changes, so saved briefs are rebuilt
+BRIEF_MAX_TOKENS = 600
+BRIEF_MIN_CHARS = 3000  # job and team text shorter than this is used as is
+
+# One brief build per (job, inputs) at a time; evaluations of the same job wait for it
+_builds = SingleFlight()
+
+
+def job_inputs(job_id):
+    """The job description, team profiles and team summary the evaluation prompts are based on."""
+    return _inputs(get_job_context(job_id))
+
+
+def _inputs(job):
+    return (
+        job.get("job_description", "No job description available."),
+        job.get("team_profiles", "No team profile available."),
+        get_team_summary(),
+    )
+
+
+def brief_key(job_description, team_profiles, team_summary):
+    payload = json.dumps([BRIEF_VERSION, job_description, team_profiles, team_summary])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def full_context(job_description, team_profiles, team_summary):
+    """The uncompacted job and team text, used when no brief is available."""
+    return (
+        f"Job Description:\n{job_description}\n\n"
+        f"Team Profiles:\n{team_profiles}\n\n"
+        f"Team Summary:\n{team_summary}"
+    )
+
+
+def build_job_brief(job_description, team_profiles, team_summary):
+    prompt = (
+        "Condense the hiring context below into a brief that will be used to evaluate many "
+        "candidates for this job. Keep every fact that matters for judging fit and drop "
+        "everything else.\n\n"
+        f"{full_context(job_description, team_profiles, team_summary)}\n\n"
+        "Write at most 300 words under these headings:\n"
+        "- Role (title, specialization, seniority, minimum years of experience)\n"
+        "- Must-have skills\n"
+        "- Nice-to-have skills\n"
+        "- Key responsibilities\n"
+        "- Team strengths already covered\n"
+        "- Gaps this hire should fill\n"
+        "Use short bullet points. Do not invent requirements that are not stated."
+    )
+
+    return get_response(
+        input=prompt,
+        template=lambda x: x,
+        llm="llama",
+        md=False,
+        temperature=0.0,
+        max_tokens=BRIEF_MAX_TOKENS,
+        cache=True,
+        label="build_job_brief",
+    ).strip()
+
+
+def get_job_brief(job_id):
+    """
+    Compact digest of a job, its team profiles and the team summary for evaluation prompts.
+
+    Built once and saved on the job record with a hash of its inputs; a change to any of them
+    makes the next call rebuild it. Context that is already short is returned unchanged.
+    """
+    job = get_job_context(job_id)
+    inputs = _inputs(job)
+    full = full_context(*inputs)
+    if len(full) < BRIEF_MIN_CHARS:
+        return full
+    key = brief_key(*inputs)
+    if job.get("job_brief_key") == key and job.get("job_brief"):
+        return job["job_brief"]
+    return _builds.do((job_id, key), lambda: _build(job_id, key, inputs, exists=bool(job)))
+
+
+def _build(job_id, key, inputs, exists):
+    print(f"🧾 Building job brief for {job_id}")
+    brief = build_job_brief(*inputs)
+    if exists:
+        update_job_context(job_id, lambda job: job.update(job_brief=brief, job_brief_key=key))
+    return brief
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "milestone2", "data", "llm_cache.db")),
+)
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+
+-- Running total of the response sizes, kept by triggers so every process sees the same number
+-- and put() does not have to sum the table
+CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+    UPDATE totals SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE totals SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+    UPDATE totals SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+_EVICT_BATCH = 64
+
+
+def cache_key(provider, model, messages, temperature, max_tokens):
+    """Content hash of everything that determines an LLM reply."""
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM responses in a SQLite file, keyed by cache_key().
+
+    Shared by every worker process using the same file. When the stored responses exceed
+    `max_bytes`, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """Cached response for `key`, or None."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with conn:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the triggers
+                conn.execute(
+                    "INSERT INTO responses (key, response, size, accessed) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET response = excluded.response, size = excluded.size, "
+                    "accessed = excluded.accessed",
+                    (key, response, size, time.time()),
+                )
+                self._evict(conn)
+
+    def _total(self, conn):
+        return conn.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self, conn):
+        total = self._total(conn)
+        while total > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.evictions += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size of the cache file."""
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = self._total(conn)
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide ResponseCache at LLM_CACHE_PATH."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
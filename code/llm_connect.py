@@ -1,11 +1,140 @@
+import asyncio
+import contextvars
+import json
 import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
 import pyrsm as rsm
 import google.generativeai as genai
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # from google.genai import types
 from typing import List
 
+from llm_cache import cache_key, get_cache
+from llm_metrics import current, estimate_tokens, observe, track
+from llm_limits import acall_limited, call_limited, get_limiter, is_quota_error
+from llm_router import PROVIDERS, hedge_delay, record, record_cancelled, route
+from single_flight import SingleFlight
+
+# Point at code/llm_stub_server.py (or any OpenAI-compatible server) for offline and load testing
+LLAMA_URL = os.getenv("LLAMA_API_URL", "https://traip13.tgptinf.ucsd.edu/v1/chat/completions")
+
+# HTTP client settings for the Llama endpoint (seconds / counts)
+LLAMA_CONNECT_TIMEOUT = float(os.getenv("LLAMA_CONNECT_TIMEOUT", "10"))
+LLAMA_READ_TIMEOUT = float(os.getenv("LLAMA_READ_TIMEOUT", "120"))
+LLAMA_MAX_RETRIES = int(os.getenv("LLAMA_MAX_RETRIES", "3"))
+LLAMA_BACKOFF_FACTOR = float(os.getenv("LLAMA_BACKOFF_FACTOR", "0.5"))
+LLAMA_BACKOFF_JITTER = float(os.getenv("LLAMA_BACKOFF_JITTER", "0.5"))
+LLAMA_POOL_CONNECTIONS = int(os.getenv("LLAMA_POOL_CONNECTIONS", "4"))
+LLAMA_POOL_MAXSIZE = int(os.getenv("LLAMA_POOL_MAXSIZE", "16"))
+
+# Transient server errors retried by the HTTP clients. 429 is left to the rate limiter, whose
+# shared cooldown backs off every caller at once (see llm_limits.call_limited).
+LLAMA_RETRY_STATUSES = (500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+# Identical get_response/aget_response requests running at the same time share one upstream call
+_in_flight = SingleFlight()
+
+_gemini_models = {}  # (model name, tools, generation config) -> GenerativeModel
+_gemini_api_key = None
+_gemini_lock = threading.Lock()
+
+# Runs get_responses() items; the provider limiters decide how many actually reach the API at once
+LLM_BATCH_WORKERS = int(os.getenv("LLM_BATCH_WORKERS", "32"))
+_batch_pool = ThreadPoolExecutor(max_workers=LLM_BATCH_WORKERS, thread_name_prefix="llm-batch")
+
+# Runs the competing calls of hedged llm="auto" requests: room for a primary and a hedge per batch item
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_HEDGE_WORKERS", str(2 * LLM_BATCH_WORKERS))), thread_name_prefix="llm-hedge"
+)
+
+
+def get_http_session() -> requests.Session:
+    """
+    Shared keep-alive session for LLM HTTP calls.
+
+    Connections are pooled and reused across threads, and 5xx responses and dropped connections
+    are retried with jittered exponential backoff. 429 is returned as is for the rate limiter.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=LLAMA_MAX_RETRIES,
+                backoff_factor=LLAMA_BACKOFF_FACTOR,
+                backoff_jitter=LLAMA_BACKOFF_JITTER,
+                status_forcelist=LLAMA_RETRY_STATUSES,
+                allowed_methods=None,  # chat completions are POSTs; retry them too
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=LLAMA_POOL_CONNECTIONS,
+                pool_maxsize=LLAMA_POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get_gemini_model(
+    model_name: str = "gemini-2.0-flash",
+    tools: list = None,
+    generation_config: dict = None,
+    api_key: str = None,
+):
+    """
+    Shared GenerativeModel for (model name, tools, generation config), created on first use.
+
+    The SDK is configured once per API key instead of on every call, and models are safe to use
+    from several sessions at once (each call or start_chat() keeps its own state). Tools are
+    matched by identity, so pass the same module-level Tool objects on every call.
+    """
+    global _gemini_api_key
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    key = (
+        model_name,
+        tuple(id(tool) for tool in tools or ()),
+        json.dumps(generation_config, sort_keys=True) if generation_config else None,
+    )
+    with _gemini_lock:
+        if api_key != _gemini_api_key:
+            genai.configure(api_key=api_key)
+            _gemini_api_key = api_key
+            _gemini_models.clear()  # models keep the client of the key they were built with
+        model = _gemini_models.get(key)
+        if model is None:
+            model = _gemini_models[key] = genai.GenerativeModel(
+                model_name=model_name, tools=tools, generation_config=generation_config
+            )
+        return model
+
+
+def send_chat_message(chat, message, label: str = None, model_name: str = "gemini-2.0-flash"):
+    """
+    chat.send_message() for a Gemini chat session (e.g. the tool-calling chats), under the
+    Gemini rate limiter and recorded in the LLM metrics as `label`
+    """
+    with track(label, "gemini", model_name) as call:
+        call.cache = "off"
+        response = call_limited("gemini", model_name, chat.send_message, message)
+        _observe_gemini_usage(response, message)
+    return response
+
 
 def query_llama(
     messages: List[dict],
@@ -34,7 +163,6 @@ def query_llama(
     Returns:
         dict: The model's response
     """
-    url = "https://traip13.tgptinf.ucsd.edu/v1/chat/completions"
     if not api_key or len(api_key) == 0:
         raise ValueError("LLAMA: API key is required")
 
@@ -48,22 +176,187 @@ def query_llama(
         "n": 1,
     }
 
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()  # Raise an exception for bad status codes
+    def post():
+        response = get_http_session().post(
+            LLAMA_URL, headers=headers, json=data, timeout=(LLAMA_CONNECT_TIMEOUT, LLAMA_READ_TIMEOUT)
+        )
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return response.json()
+
+    # Rate limit / concurrency cap shared by every caller in this process
+    result = call_limited("llama", model, post)
+    _observe_llama_usage(result, messages)
+    return result
 
-    return response.json()
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive async client for the running event loop (one per loop, created on first use)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLAMA_READ_TIMEOUT, connect=LLAMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=LLAMA_POOL_MAXSIZE, max_keepalive_connections=LLAMA_POOL_MAXSIZE
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=LLAMA_MAX_RETRIES),  # connect errors only
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """Backoff before retry `attempt` (1-based): Retry-After if given, else jittered exponential."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return LLAMA_BACKOFF_FACTOR * (2 ** (attempt - 1)) + random.uniform(0, LLAMA_BACKOFF_JITTER)
+
+
+async def aquery_llama(
+    messages: List[dict],
+    model: str = "llama-3",
+    max_tokens: int = 4000,
+    temperature: int = 0.4,
+    api_key: str = "",
+) -> dict:
+    """
+    Async version of query_llama: same arguments and return value, but awaits the HTTP call
+    so the event loop can keep serving other sessions. 5xx responses are retried with the same
+    backoff settings as the synchronous client; 429 goes to the rate limiter.
+    """
+    if not api_key or len(api_key) == 0:
+        raise ValueError("LLAMA: API key is required")
+
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+    data = {
+        "messages": messages,
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": False,
+        "n": 1,
+    }
+
+    async def post():
+        client = get_async_http_client()
+        for attempt in range(LLAMA_MAX_RETRIES + 1):
+            response = await client.post(LLAMA_URL, headers=headers, json=data)
+            if response.status_code not in LLAMA_RETRY_STATUSES or attempt == LLAMA_MAX_RETRIES:
+                break
+            await asyncio.sleep(_retry_delay(attempt + 1, response))
+
+        response.raise_for_status()
+        return response.json()
+
+    result = await acall_limited("llama", model, post)
+    _observe_llama_usage(result, messages)
+    return result
+
+
+def stream_llama(
+    messages: List[dict],
+    model: str = "llama-3",
+    max_tokens: int = 4000,
+    temperature: int = 0.4,
+    api_key: str = "",
+    call=None,
+):
+    """
+    Stream a Llama reply: yields text fragments as the server produces them (server-sent events).
+    Same arguments as query_llama; limiter queueing and upstream time are added to `call`
+    (an llm_metrics.Call) when given.
+    """
+    headers, data = _llama_stream_request(messages, model, max_tokens, temperature, api_key)
+    limiter = get_limiter("llama", model)
+
+    # The slot is held until the stream is exhausted or closed
+    with limiter.slot(call), get_http_session().post(
+        LLAMA_URL, headers=headers, json=data, stream=True, timeout=(LLAMA_CONNECT_TIMEOUT, LLAMA_READ_TIMEOUT)
+    ) as response:
+        if response.status_code == 429:
+            limiter.backoff()
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            text = _sse_text(line)
+            if text is None:
+                break
+            if text:
+                yield text
+
+
+async def astream_llama(
+    messages: List[dict],
+    model: str = "llama-3",
+    max_tokens: int = 4000,
+    temperature: int = 0.4,
+    api_key: str = "",
+    call=None,
+):
+    """Async version of stream_llama (an async generator of text fragments)."""
+    headers, data = _llama_stream_request(messages, model, max_tokens, temperature, api_key)
+    limiter = get_limiter("llama", model)
+
+    async with limiter.aslot(call):
+        client = get_async_http_client()
+        request = client.build_request("POST", LLAMA_URL, headers=headers, json=data)
+        for attempt in range(LLAMA_MAX_RETRIES + 1):
+            response = await client.send(request, stream=True)
+            if response.status_code not in LLAMA_RETRY_STATUSES or attempt == LLAMA_MAX_RETRIES:
+                break
+            await response.aclose()
+            await asyncio.sleep(_retry_delay(attempt + 1, response))
+
+        try:
+            if response.is_error:
+                if response.status_code == 429:
+                    limiter.backoff()
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                text = _sse_text(line)
+                if text is None:
+                    break
+                if text:
+                    yield text
+        finally:
+            await response.aclose()
+
+
+def _llama_stream_request(messages, model, max_tokens, temperature, api_key):
+    if not api_key or len(api_key) == 0:
+        raise ValueError("LLAMA: API key is required")
+
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+    data = {
+        "messages": messages,
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True,
+        "n": 1,
+    }
+    return headers, data
+
+
+def _sse_text(line):
+    """Text delta carried by one SSE line: "" for keep-alives and non-data lines, None at [DONE]."""
+    if not line or not line.startswith("data:"):
+        return ""
+    payload = line[len("data:"):].strip()
+    if payload == "[DONE]":
+        return None
+    choices = json.loads(payload).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
 
 
 def test_llama_connection(api_key: str, timeout: int = 20) -> bool:
     """Test connection to Llama API with a basic request"""
-    import requests
-
-    url = "https://traip13.tgptinf.ucsd.edu/v1/chat/completions"
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
     data = {"messages": [], "model": "llama-3", "max_tokens": 1, "temperature": 0.4}
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=20)
+        response = get_http_session().post(LLAMA_URL, headers=headers, json=data, timeout=timeout)
         print(f"Status code: {response.status_code}")
         print(f"Response headers: {response.headers}")
         try:
@@ -110,6 +403,90 @@ def query_gemini(
         dict: The model's response
     """
 
+    model_name = model
+    model, prompt, generation_config_obj = _gemini_request(messages, model, max_tokens, temperature, api_key)
+
+    # Generate content using the correct parameter name 'generation_config'
+    response = call_limited(
+        "gemini", model_name, model.generate_content, contents=prompt, generation_config=generation_config_obj
+    )
+    _observe_gemini_usage(response, prompt)
+
+    return response.text
+
+
+async def aquery_gemini(
+    messages: List[dict],
+    model: str = "gemini-2.0-flash",
+    max_tokens: int = 4000,
+    temperature: int = 0.4,
+    api_key: str = "",
+) -> str:
+    """Async version of query_gemini, using the SDK's native async call."""
+    model_name = model
+    model, prompt, generation_config_obj = _gemini_request(messages, model, max_tokens, temperature, api_key)
+
+    response = await acall_limited(
+        "gemini", model_name, model.generate_content_async, contents=prompt, generation_config=generation_config_obj
+    )
+    _observe_gemini_usage(response, prompt)
+
+    return response.text
+
+
+def stream_gemini(
+    messages: List[dict],
+    model: str = "gemini-2.0-flash",
+    max_tokens: int = 4000,
+    temperature: int = 0.4,
+    api_key: str = "",
+    call=None,
+):
+    """Stream a Gemini reply: yields text fragments as they arrive. Same arguments as query_gemini, plus `call` as in stream_llama."""
+    limiter = get_limiter("gemini", model)
+    model, prompt, generation_config_obj = _gemini_request(messages, model, max_tokens, temperature, api_key)
+
+    with limiter.slot(call):
+        try:
+            response = model.generate_content(
+                contents=prompt, generation_config=generation_config_obj, stream=True
+            )
+            for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
+        except Exception as e:
+            if is_quota_error(e):
+                limiter.backoff()
+            raise
+
+
+async def astream_gemini(
+    messages: List[dict],
+    model: str = "gemini-2.0-flash",
+    max_tokens: int = 4000,
+    temperature: int = 0.4,
+    api_key: str = "",
+    call=None,
+):
+    """Async version of stream_gemini."""
+    limiter = get_limiter("gemini", model)
+    model, prompt, generation_config_obj = _gemini_request(messages, model, max_tokens, temperature, api_key)
+
+    async with limiter.aslot(call):
+        try:
+            response = await model.generate_content_async(
+                contents=prompt, generation_config=generation_config_obj, stream=True
+            )
+            async for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
+        except Exception as e:
+            if is_quota_error(e):
+                limiter.backoff()
+            raise
+
+
+def _gemini_request(messages, model, max_tokens, temperature, api_key):
     if not api_key or len(api_key) == 0:
         raise ValueError("Gemini: API key is required")
 
@@ -120,10 +497,7 @@ def query_gemini(
     # Combine system message (if any) with the user message
     prompt = ". ".join(system_message + user_messages)
 
-    genai.configure(api_key=api_key)
-
-    # Initialize the model
-    model = genai.GenerativeModel(model_name=model)
+    model = get_gemini_model(model, api_key=api_key)
 
     # Define the generation configuration using the specific class
     generation_config_obj = genai.types.GenerationConfig(
@@ -131,12 +505,25 @@ def query_gemini(
         max_output_tokens=max_tokens,
     )
 
-    # Generate content using the correct parameter name 'generation_config'
-    response = model.generate_content(
-        contents=prompt, generation_config=generation_config_obj
+    return model, prompt, generation_config_obj
+
+
+def _observe_llama_usage(result, messages):
+    # Token counts for llm_metrics; estimated when the server reports no usage
+    usage = result.get("usage") or {}
+    text = result["choices"][0]["message"]["content"] if result.get("choices") else ""
+    observe(
+        prompt_tokens=usage.get("prompt_tokens") or estimate_tokens(" ".join(m["content"] for m in messages)),
+        completion_tokens=usage.get("completion_tokens") or estimate_tokens(text),
     )
 
-    return response.text
+
+def _observe_gemini_usage(response, prompt):
+    usage = getattr(response, "usage_metadata", None)
+    observe(
+        prompt_tokens=getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt),
+        completion_tokens=getattr(usage, "candidates_token_count", 0),
+    )
 
 
 def get_response(
@@ -148,35 +535,97 @@ def get_response(
     md: bool = True,
     llm: str = "llama",
     model_name: str = None,
+    cache: bool = False,
+    hedge: bool = False,
+    label: str = None,
+    validate: callable = None,
 ):
     """
     Function to get a response from the LLama API
+
+    `label` names the call site in the LLM metrics (llm_metrics.summary() and /metrics).
+
+    llm="auto" picks the provider with the best recent latency and error rate and fails over to
+    the other one on errors. With hedge=True it also sends the request to the second provider
+    once the first has taken longer than its recent p95, and returns whichever answers first.
+
+    With cache=True, an identical earlier request (same provider, model, messages, temperature
+    and max_tokens) is answered from the on-disk response cache instead of calling the LLM.
+    Only use it for prompts where a repeated answer is acceptable (low temperature, extraction).
+    Pass `validate` (e.g. the caller's parser) so malformed replies are not cached: a response
+    is only stored, and a cached one only used, when validate(response) doesn't raise.
+
+    Identical requests already in flight (from other sessions or threads) wait for and share
+    that call instead of sending their own.
     """
-    messages = [
-        {"role": "system", "content": role},
-        {
-            "role": "user",
-            "content": template(input),
-        },
-    ]
+    messages = _messages(input, template, role)
+    key = _request_key(llm, model_name, messages, temperature, max_tokens)
 
-    if llm == "llama":
-        response = query_llama(
-            messages=messages,
-            api_key=os.getenv("LLAMA_API_KEY"),
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )["choices"][0]["message"]["content"]
-    elif llm == "gemini":
-        response = query_gemini(
-            messages=messages,
-            api_key=os.getenv("GEMINI_API_KEY"),
-            temperature=temperature,
-            max_tokens=max_tokens,
-            model=model_name if model_name else 'gemini-2.0-flash'
-        )
+    def complete():
+        cached = _cache_lookup(key, cache, validate)
+        if cached is not None:
+            return cached
+
+        def call(provider):
+            return _query(provider, messages, temperature, max_tokens, model_name)
+
+        if llm == "auto":
+            response = _first_answer(route(), call, hedge)
+        else:
+            response = call(llm)
+
+        if cache and _valid(response, validate):
+            get_cache().put(key, response)
+        return response
+
+    with track(label, llm, _model_name(llm, model_name)):
+        response = _in_flight.do(key, complete)
+
+    if md:
+        return rsm.md(response)
     else:
-        raise ValueError("LLM: Invalid LLM specified")
+        return response
+
+
+async def aget_response(
+    input: str | List[str],
+    template: callable,
+    role: str = "You are a helpful assistant.",
+    temperature: float = 0.4,
+    max_tokens: int = 4000,
+    md: bool = True,
+    llm: str = "llama",
+    model_name: str = None,
+    cache: bool = False,
+    hedge: bool = False,
+    label: str = None,
+    validate: callable = None,
+):
+    """
+    Async version of get_response for async Shiny renders and extended tasks
+    """
+    messages = _messages(input, template, role)
+    key = _request_key(llm, model_name, messages, temperature, max_tokens)
+
+    async def complete():
+        cached = _cache_lookup(key, cache, validate)
+        if cached is not None:
+            return cached
+
+        def call(provider):
+            return _aquery(provider, messages, temperature, max_tokens, model_name)
+
+        if llm == "auto":
+            response = await _afirst_answer(route(), call, hedge)
+        else:
+            response = await call(llm)
+
+        if cache and _valid(response, validate):
+            get_cache().put(key, response)
+        return response
+
+    with track(label, llm, _model_name(llm, model_name)):
+        response = await _in_flight.ado(key, complete)
 
     if md:
         return rsm.md(response)
@@ -184,6 +633,381 @@ def get_response(
         return response
 
 
+def get_responses(
+    inputs: List,
+    template: callable,
+    role: str = "You are a helpful assistant.",
+    temperature: float = 0.4,
+    max_tokens: int = 4000,
+    md: bool = True,
+    llm: str = "llama",
+    model_name: str = None,
+    cache: bool = False,
+    hedge: bool = False,
+    label: str = None,
+    validate: callable = None,
+) -> list:
+    """
+    get_response for a batch of inputs, sent concurrently under the provider rate limits
+
+    Results come back in input order. A failed item holds its exception instead of a response,
+    so one bad call does not fail the batch:
+
+        replies = get_responses(prompts, template=lambda x: x, md=False)
+        for prompt, reply in zip(prompts, replies):
+            if isinstance(reply, Exception): ...
+    """
+    def one(item):
+        return get_response(
+            item, template, role=role, temperature=temperature, max_tokens=max_tokens, md=md,
+            llm=llm, model_name=model_name, cache=cache, hedge=hedge, label=label, validate=validate,
+        )
+
+    futures = [_batch_pool.submit(contextvars.copy_context().run, one, item) for item in inputs]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+async def aget_responses(
+    inputs: List,
+    template: callable,
+    role: str = "You are a helpful assistant.",
+    temperature: float = 0.4,
+    max_tokens: int = 4000,
+    md: bool = True,
+    llm: str = "llama",
+    model_name: str = None,
+    cache: bool = False,
+    hedge: bool = False,
+    label: str = None,
+    validate: callable = None,
+) -> list:
+    """Async version of get_responses"""
+    results = await asyncio.gather(
+        *(
+            aget_response(
+                item, template, role=role, temperature=temperature, max_tokens=max_tokens, md=md,
+                llm=llm, model_name=model_name, cache=cache, hedge=hedge, label=label, validate=validate,
+            )
+            for item in inputs
+        ),
+        return_exceptions=True,
+    )
+    # Cancellation of the batch itself is not a per-item error
+    for result in results:
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+    return results
+
+
+def _query(llm, messages, temperature, max_tokens, model_name):
+    # One provider call, timed for the llm="auto" router
+    start = time.perf_counter()
+    try:
+        if llm == "llama":
+            response = query_llama(
+                messages=messages,
+                api_key=os.getenv("LLAMA_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )["choices"][0]["message"]["content"]
+        elif llm == "gemini":
+            response = query_gemini(
+                messages=messages,
+                api_key=os.getenv("GEMINI_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                model=model_name if model_name else 'gemini-2.0-flash'
+            )
+        else:
+            raise ValueError("LLM: Invalid LLM specified")
+    except Exception:
+        if llm in PROVIDERS:
+            record(llm, time.perf_counter() - start, ok=False)
+        raise
+    record(llm, time.perf_counter() - start, ok=True)
+    _answered_by(llm, model_name)
+    return response
+
+
+async def _aquery(llm, messages, temperature, max_tokens, model_name):
+    start = time.perf_counter()
+    try:
+        if llm == "llama":
+            response = (await aquery_llama(
+                messages=messages,
+                api_key=os.getenv("LLAMA_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+            ))["choices"][0]["message"]["content"]
+        elif llm == "gemini":
+            response = await aquery_gemini(
+                messages=messages,
+                api_key=os.getenv("GEMINI_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                model=model_name if model_name else 'gemini-2.0-flash'
+            )
+        else:
+            raise ValueError("LLM: Invalid LLM specified")
+    except asyncio.CancelledError:
+        # A hedge loser: its true latency is unknown, so keep it out of the quantiles
+        if llm in PROVIDERS:
+            record_cancelled(llm)
+        raise
+    except Exception:
+        if llm in PROVIDERS:
+            record(llm, time.perf_counter() - start, ok=False)
+        raise
+    record(llm, time.perf_counter() - start, ok=True)
+    _answered_by(llm, model_name)
+    return response
+
+
+def _answered_by(llm, model_name):
+    # llm="auto" calls are reported under the provider that answered
+    call = current()
+    if call is not None and call.provider == "auto":
+        call.provider, call.model = llm, _model_name(llm, model_name)
+
+
+def _first_answer(providers, call, hedge):
+    """
+    First successful `call(provider)`, trying providers in order.
+
+    A failure moves on to the next provider. With `hedge`, the next provider is also started when
+    the current one runs past its hedge delay; the slower call finishes in the background.
+    """
+    if not hedge:
+        for i, provider in enumerate(providers):
+            try:
+                return call(provider)
+            except Exception as e:
+                if i == len(providers) - 1:
+                    raise
+                print(f"⚠️ {provider} failed ({e}), failing over to {providers[i + 1]}")
+
+    remaining = list(providers)
+    pending = {}
+    started = {}  # provider -> set once its call is running, not just queued for a pool thread
+    last_error = None
+
+    def run(provider):
+        started[provider].set()
+        return call(provider)
+
+    def launch():
+        provider = remaining.pop(0)
+        started[provider] = threading.Event()
+        # Run in a copy of this context so the pool thread reports to the same metrics call
+        pending[_hedge_pool.submit(contextvars.copy_context().run, run, provider)] = provider
+        return provider
+
+    current = launch()
+    while pending:
+        if remaining:
+            # The hedge delay counts from when the call started, not from when it was queued
+            started[current].wait()
+        timeout = hedge_delay(current) if remaining else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            print(f"⏱️ {current} is slow, hedging with {remaining[0]}")
+            current = launch()
+            continue
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                return future.result()
+            except Exception as e:
+                last_error = e
+                print(f"⚠️ {provider} failed ({e})")
+        if not pending and remaining:
+            current = launch()
+    raise last_error
+
+
+async def _afirst_answer(providers, call, hedge):
+    """Async version of _first_answer; the losing request of a hedge is cancelled."""
+    remaining = list(providers)
+    pending = {}
+    last_error = None
+
+    def launch():
+        provider = remaining.pop(0)
+        pending[asyncio.ensure_future(call(provider))] = provider
+        return provider
+
+    current = launch()
+    try:
+        while pending:
+            timeout = hedge_delay(current) if hedge and remaining else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"⏱️ {current} is slow, hedging with {remaining[0]}")
+                current = launch()
+                continue
+            for task in done:
+                provider = pending.pop(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+                print(f"⚠️ {provider} failed ({last_error})")
+            if not pending and remaining:
+                current = launch()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def stream_response(
+    input: str | List[str],
+    template: callable,
+    role: str = "You are a helpful assistant.",
+    temperature: float = 0.4,
+    max_tokens: int = 4000,
+    llm: str = "llama",
+    model_name: str = None,
+    label: str = None,
+):
+    """
+    Like get_response(md=False), but yields the reply in fragments as the model generates it
+    """
+    messages = _messages(input, template, role)
+    if llm not in ("llama", "gemini"):
+        raise ValueError("LLM: Invalid LLM specified")
+
+    with track(label, llm, _model_name(llm, model_name), bind=False) as call:
+        call.cache = "off"
+        if llm == "llama":
+            stream = stream_llama(
+                messages=messages,
+                api_key=os.getenv("LLAMA_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                call=call,
+            )
+        else:
+            stream = stream_gemini(
+                messages=messages,
+                api_key=os.getenv("GEMINI_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                model=model_name if model_name else 'gemini-2.0-flash',
+                call=call,
+            )
+        parts = []
+        started, first = time.perf_counter(), None
+        for text in stream:
+            if first is None:
+                first = time.perf_counter()
+            parts.append(text)
+            yield text
+        _stream_usage(call, messages, parts, started, first)
+
+
+async def astream_response(
+    input: str | List[str],
+    template: callable,
+    role: str = "You are a helpful assistant.",
+    temperature: float = 0.4,
+    max_tokens: int = 4000,
+    llm: str = "llama",
+    model_name: str = None,
+    label: str = None,
+):
+    """
+    Async version of stream_response, e.g. for ui.MarkdownStream in Shiny
+    """
+    messages = _messages(input, template, role)
+    if llm not in ("llama", "gemini"):
+        raise ValueError("LLM: Invalid LLM specified")
+
+    with track(label, llm, _model_name(llm, model_name), bind=False) as call:
+        call.cache = "off"
+        if llm == "llama":
+            stream = astream_llama(
+                messages=messages,
+                api_key=os.getenv("LLAMA_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                call=call,
+            )
+        else:
+            stream = astream_gemini(
+                messages=messages,
+                api_key=os.getenv("GEMINI_API_KEY"),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                model=model_name if model_name else 'gemini-2.0-flash',
+                call=call,
+            )
+        parts = []
+        started, first = time.perf_counter(), None
+        async for text in stream:
+            if first is None:
+                first = time.perf_counter()
+            parts.append(text)
+            yield text
+        _stream_usage(call, messages, parts, started, first)
+
+
+def _stream_usage(call, messages, parts, started, first):
+    # Streams report no usage, so tokens are estimated. Queueing and upstream time come from the
+    # limiter slot; the time to the first fragment is recorded on its own
+    call.add(
+        prompt_tokens=estimate_tokens(" ".join(m["content"] for m in messages)),
+        completion_tokens=estimate_tokens("".join(parts)),
+    )
+    if first is not None:
+        call.ttft_s = first - started
+
+
+def _model_name(llm, model_name):
+    return model_name or {"llama": "llama-3", "gemini": "gemini-2.0-flash"}.get(llm, "")
+
+
+def _cache_lookup(key, cache, validate=None):
+    call = current()
+    cached = get_cache().get(key) if cache else None
+    if cached is not None and not _valid(cached, validate):
+        cached = None  # stored before validation existed; the fresh answer replaces it
+    if call is not None:
+        call.cache = "off" if not cache else "miss" if cached is None else "hit"
+    return cached
+
+
+def _valid(response, validate):
+    if validate is None:
+        return True
+    try:
+        validate(response)
+        return True
+    except Exception as e:
+        print(f"⚠️ Not caching malformed response: {e}")
+        return False
+
+
+def _request_key(llm, model_name, messages, temperature, max_tokens):
+    # Resolve the default model so an explicit and an implicit default share entries
+    return cache_key(llm, _model_name(llm, model_name), messages, temperature, max_tokens)
+
+
+def _messages(input, template, role):
+    return [
+        {"role": "system", "content": role},
+        {
+            "role": "user",
+            "content": template(input),
+        },
+    ]
+
+
 if __name__ == "__main__":
     from dotenv import load_dotenv
 
@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import os
+import random
+import threading
+import time
+
+from llm_metrics import observe
+
+# Per-provider defaults; override with e.g. LLM_RATE_GEMINI=0.25 (requests/second),
+# LLM_BURST_GEMINI=2 and LLM_MAX_IN_FLIGHT_GEMINI=2. Limits apply per (provider, model).
+DEFAULT_LIMITS = {
+    "llama": {"rate": 5.0, "burst": 10, "max_in_flight": 8},
+    "gemini": {"rate": 1.0, "burst": 5, "max_in_flight": 4},
+}
+QUOTA_RETRIES = int(os.getenv("LLM_QUOTA_RETRIES", "4"))
+QUOTA_BACKOFF = float(os.getenv("LLM_QUOTA_BACKOFF", "2.0"))  # seconds, doubled per consecutive quota error
+QUOTA_BACKOFF_MAX = float(os.getenv("LLM_QUOTA_BACKOFF_MAX", "60"))
+
+_POLL = 0.05  # async waiters re-check this often while the limiter is full
+
+
+class RateLimiter:
+    """
+    Token bucket plus an in-flight cap for one provider/model, shared by threads and event loops.
+
+    A quota error puts the whole limiter into a cooldown (exponential with jitter), so every
+    waiting caller backs off instead of each one hitting the quota separately.
+    """
+
+    def __init__(self, rate, burst, max_in_flight):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.throttled = 0  # quota errors seen
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cooldown_until = 0.0
+        self._strikes = 0
+        self._cond = threading.Condition()
+
+    def _try_enter(self):
+        # Caller holds _cond. Returns 0 when a slot was taken, else seconds to wait.
+        now = time.monotonic()
+        if now < self._cooldown_until:
+            return self._cooldown_until - now
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.in_flight >= self.max_in_flight:
+            return _POLL
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        self.in_flight += 1
+        return 0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._try_enter()
+                if not wait:
+                    return
+                self._cond.wait(wait)
+
+    async def aacquire(self):
+        while True:
+            with self._cond:
+                wait = self._try_enter()
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def release(self, ok=True):
+        with self._cond:
+            self.in_flight -= 1
+            if ok:
+                self._strikes = 0
+            self._cond.notify_all()
+
+    def backoff(self):
+        """Record a quota error and start a shared cooldown. Returns its length in seconds."""
+        with self._cond:
+            self.throttled += 1
+            self._strikes += 1
+            delay = min(QUOTA_BACKOFF_MAX, QUOTA_BACKOFF * 2 ** (self._strikes - 1))
+            delay += random.uniform(0, delay / 2)
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            self._tokens = 0
+            return delay
+
+    @contextlib.contextmanager
+    def slot(self, call=None):
+        # Timings go to `call` when given (streams, which are not the current call), else to the current call
+        report = call.add if call is not None else observe
+        start = time.monotonic()
+        self.acquire()
+        entered = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.release(ok)
+            report(queue_s=entered - start, upstream_s=time.monotonic() - entered)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, call=None):
+        # Timings go to `call` when given (streams, which are not the current call), else to the current call
+        report = call.add if call is not None else observe
+        start = time.monotonic()
+        await self.aacquire()
+        entered = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.release(ok)
+            report(queue_s=entered - start, upstream_s=time.monotonic() - entered)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider, model):
+    with _limiters_lock:
+        limiter = _limiters.get((provider, model))
+        if limiter is None:
+            limits = DEFAULT_LIMITS.get(provider, DEFAULT_LIMITS["llama"])
+            name = provider.upper()
+            limiter = _limiters[(provider, model)] = RateLimiter(
+                rate=float(os.getenv(f"LLM_RATE_{name}", limits["rate"])),
+                burst=int(os.getenv(f"LLM_BURST_{name}", limits["burst"])),
+                max_in_flight=int(os.getenv(f"LLM_MAX_IN_FLIGHT_{name}", limits["max_in_flight"])),
+            )
+        return limiter
+
+
+def is_quota_error(e):
+    """Rate-limit / quota failures from either provider (Gemini ResourceExhausted, HTTP 429)."""
+    if type(e).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def call_limited(provider, model, fn, *args, **kwargs):
+    """Run `fn` under the provider/model limiter, retrying quota errors after a shared cooldown."""
+    limiter = get_limiter(provider, model)
+    for attempt in range(QUOTA_RETRIES + 1):
+        try:
+            with limiter.slot():
+                return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_quota_error(e) or attempt == QUOTA_RETRIES:
+                raise
+            delay = limiter.backoff()
+            print(f"⏳ {provider} quota hit, backing off {delay:.1f}s")
+
+
+async def acall_limited(provider, model, fn, *args, **kwargs):
+    """Async version of call_limited; `fn` returns an awaitable."""
+    limiter = get_limiter(provider, model)
+    for attempt in range(QUOTA_RETRIES + 1):
+        try:
+            async with limiter.aslot():
+                return await fn(*args, **kwargs)
+        except Exception as e:
+            if not is_quota_error(e) or attempt == QUOTA_RETRIES:
+                raise
+            delay = limiter.backoff()
+            print(f"⏳ {provider} quota hit, backing off {delay:.1f}s")
+
+
+def limiter_stats():
+    """Current in-flight count and quota errors per (provider, model)."""
+    with _limiters_lock:
+        return {
+            f"{provider}:{model}": {"in_flight": l.in_flight, "throttled": l.throttled}
+            for (provider, model), l in _limiters.items()
+        }
@@ -0,0 +1,254 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+METRICS_WINDOW = int(os.getenv("LLM_METRICS_WINDOW", "2000"))  # recent calls kept for summary()
+
+# USD per million tokens (prompt, completion); override with e.g. LLM_PRICE_GEMINI_PROMPT=0.1
+PRICES = {
+    "llama": (0.0, 0.0),  # self-hosted endpoint
+    "gemini": (0.10, 0.40),
+}
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+PHASES = ("total", "queue", "upstream", "ttft")
+
+_current = contextvars.ContextVar("llm_call", default=None)
+
+
+class Call:
+    """Metrics of one labelled LLM call, filled in while it runs."""
+
+    def __init__(self, label, provider, model):
+        self.label = label
+        self.provider = provider
+        self.model = model
+        self.cache = None  # "hit" / "miss" / "off"; stays None when another caller's result was shared
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.queue_s = 0.0  # waiting for a rate-limiter slot
+        self.upstream_s = 0.0  # inside provider calls, queueing excluded
+        self.ttft_s = None  # streams only: time to the first fragment
+        self.total_s = 0.0
+        self.error = ""
+        self._lock = threading.Lock()  # hedged requests report from two threads
+
+    def add(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def cost(self):
+        prompt_price, completion_price = price(self.provider)
+        return (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1e6
+
+    def as_dict(self):
+        return {
+            "label": self.label,
+            "provider": self.provider,
+            "model": self.model,
+            "cache": self.cache or "shared",
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "queue_s": round(self.queue_s, 4),
+            "upstream_s": round(self.upstream_s, 4),
+            "ttft_s": round(self.ttft_s, 4) if self.ttft_s is not None else None,
+            "total_s": round(self.total_s, 4),
+            "cost_usd": self.cost(),
+            "error": self.error,
+            "time": time.time(),
+        }
+
+
+def price(provider):
+    prompt, completion = PRICES.get(provider, (0.0, 0.0))
+    name = provider.upper()
+    return (
+        float(os.getenv(f"LLM_PRICE_{name}_PROMPT", prompt)),
+        float(os.getenv(f"LLM_PRICE_{name}_COMPLETION", completion)),
+    )
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for providers that report no usage."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class MetricsRegistry:
+    """
+    Process-wide LLM call metrics: cumulative counters and latency histograms per
+    (label, provider, model) for the Prometheus export, plus the most recent calls for summary().
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._calls = defaultdict(int)  # (label, provider, model, cache, error) -> count
+        self._tokens = defaultdict(int)  # (label, provider, model, kind) -> count
+        self._cost = defaultdict(float)  # (label, provider, model) -> USD
+        self._latency = {}  # (label, provider, model, phase) -> [bucket counts..., sum, count]
+
+    def record(self, call):
+        row = call.as_dict()
+        series = (row["label"], row["provider"], row["model"])
+        with self._lock:
+            self._recent.append(row)
+            self._calls[series + (row["cache"], row["error"])] += 1
+            self._tokens[series + ("prompt",)] += row["prompt_tokens"]
+            self._tokens[series + ("completion",)] += row["completion_tokens"]
+            self._cost[series] += row["cost_usd"]
+            for phase in PHASES:
+                seconds = row[f"{phase}_s"]
+                if seconds is None:
+                    continue  # no time to first token outside streams
+                histogram = self._latency.setdefault(series + (phase,), [0] * (len(LATENCY_BUCKETS) + 2))
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if seconds <= bound:
+                        histogram[i] += 1
+                histogram[-2] += seconds
+                histogram[-1] += 1
+
+    def recent(self, window_s=None):
+        with self._lock:
+            rows = list(self._recent)
+        if window_s is not None:
+            since = time.time() - window_s
+            rows = [row for row in rows if row["time"] >= since]
+        return rows
+
+    def summary(self, window_s=None):
+        """
+        Per-label totals over the recent calls (optionally only the last `window_s` seconds),
+        most expensive in wall time first.
+        """
+        by_label = defaultdict(list)
+        for row in self.recent(window_s):
+            by_label[row["label"]].append(row)
+
+        summary = []
+        for label, rows in by_label.items():
+            latencies = sorted(row["total_s"] for row in rows)
+            lookups = [row for row in rows if row["cache"] in ("hit", "miss")]
+            summary.append({
+                "label": label,
+                "calls": len(rows),
+                "errors": sum(1 for row in rows if row["error"]),
+                "cache_hit_rate": (
+                    sum(1 for row in lookups if row["cache"] == "hit") / len(lookups) if lookups else None
+                ),
+                "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+                "completion_tokens": sum(row["completion_tokens"] for row in rows),
+                "cost_usd": round(sum(row["cost_usd"] for row in rows), 6),
+                "total_s": round(sum(latencies), 3),
+                "queue_s": round(sum(row["queue_s"] for row in rows), 3),
+                "upstream_s": round(sum(row["upstream_s"] for row in rows), 3),
+                "ttft_s": round(sum(row["ttft_s"] for row in rows if row["ttft_s"] is not None), 3),
+                "p50_s": latencies[len(latencies) // 2],
+                "p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            })
+        return sorted(summary, key=lambda row: row["total_s"], reverse=True)
+
+    def prometheus_text(self):
+        """All cumulative metrics in the Prometheus text exposition format."""
+
+        def labels(**values):
+            body = ",".join(f'{name}="{_escape(value)}"' for name, value in values.items())
+            return "{" + body + "}"
+
+        lines = [
+            "# HELP llm_calls_total LLM calls by call site, provider, model, cache outcome and error class.",
+            "# TYPE llm_calls_total counter",
+        ]
+        with self._lock:
+            for (label, provider, model, cache, error), count in sorted(self._calls.items()):
+                lines.append(
+                    f"llm_calls_total{labels(label=label, provider=provider, model=model, cache=cache, error=error)} {count}"
+                )
+
+            lines += ["# HELP llm_tokens_total Prompt and completion tokens.", "# TYPE llm_tokens_total counter"]
+            for (label, provider, model, kind), count in sorted(self._tokens.items()):
+                lines.append(f"llm_tokens_total{labels(label=label, provider=provider, model=model, kind=kind)} {count}")
+
+            lines += ["# HELP llm_cost_usd_total Estimated spend in USD.", "# TYPE llm_cost_usd_total counter"]
+            for (label, provider, model), cost in sorted(self._cost.items()):
+                lines.append(f"llm_cost_usd_total{labels(label=label, provider=provider, model=model)} {cost:.6f}")
+
+            lines += [
+                "# HELP llm_latency_seconds Call latency: total wall time, rate-limiter queueing, upstream time and (streams) time to first token.",
+                "# TYPE llm_latency_seconds histogram",
+            ]
+            for (label, provider, model, phase), histogram in sorted(self._latency.items()):
+                series = dict(label=label, provider=provider, model=model, phase=phase)
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f"llm_latency_seconds_bucket{labels(**series, le=bound)} {count}")
+                lines.append(f"llm_latency_seconds_bucket{labels(**series, le='+Inf')} {histogram[-1]}")
+                lines.append(f"llm_latency_seconds_sum{labels(**series)} {histogram[-2]:.6f}")
+                lines.append(f"llm_latency_seconds_count{labels(**series)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._calls.clear()
+            self._tokens.clear()
+            self._cost.clear()
+            self._latency.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+@contextlib.contextmanager
+def track(label, provider, model, bind=True):
+    """
+    Record everything inside the block as one call of `label`. Token counts, queueing and
+    upstream time are reported from deeper layers through observe().
+
+    Generators should pass bind=False: the call is then not made current (a context variable set
+    inside a generator would leak into its consumer) and the caller fills it in directly.
+    """
+    if bind and _current.get() is not None:
+        # Nested (e.g. a helper calling get_response): the outer call owns the metrics
+        yield _current.get()
+        return
+
+    call = Call(label or "unlabeled", provider, model)
+    token = _current.set(call) if bind else None
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        call.total_s = time.perf_counter() - start
+        if token is not None:
+            _current.reset(token)
+        registry.record(call)
+
+
+def current():
+    """The call being tracked in this context, or None."""
+    return _current.get()
+
+
+def observe(**amounts):
+    """Add to the current call's counters (prompt_tokens, completion_tokens, queue_s, upstream_s)."""
+    call = _current.get()
+    if call is not None:
+        call.add(**amounts)
+
+
+def summary(window_s=None):
+    return registry.summary(window_s)
+
+
+def prometheus_text():
+    return registry.prometheus_text()
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Providers llm="auto" may route to, in order of preference when nothing is known yet
+PROVIDERS = ("llama", "gemini")
+
+ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))  # calls remembered per provider
+ROUTER_MAX_FAILURES = int(os.getenv("LLM_ROUTER_MAX_FAILURES", "3"))  # consecutive errors before ejection
+ROUTER_EJECT_SECONDS = float(os.getenv("LLM_ROUTER_EJECT_SECONDS", "30"))
+HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "2"))  # never hedge earlier than this
+HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "10"))  # until a p95 is known
+
+
+class ProviderStats:
+    """Rolling latency and error record for one provider."""
+
+    def __init__(self, window=ROUTER_WINDOW):
+        self.calls = deque(maxlen=window)  # (seconds, ok)
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.cancelled = 0  # hedge losers stopped early: their latency is unknown, so not in `calls`
+
+    def record(self, seconds, ok):
+        self.calls.append((seconds, ok))
+        if ok:
+            self.failures = 0
+            self.ejected_until = 0.0
+        else:
+            self.failures += 1
+            if self.failures >= ROUTER_MAX_FAILURES:
+                self.ejected_until = time.monotonic() + ROUTER_EJECT_SECONDS
+
+    def available(self):
+        return time.monotonic() >= self.ejected_until
+
+    def error_rate(self):
+        return sum(1 for _, ok in self.calls if not ok) / len(self.calls) if self.calls else 0.0
+
+    def latency(self, q):
+        """Latency quantile of successful calls, or None before the first one."""
+        ok = sorted(seconds for seconds, ok in self.calls if ok)
+        if not ok:
+            return None
+        return ok[min(len(ok) - 1, int(len(ok) * q))]
+
+    def summary(self):
+        return {
+            "calls": len(self.calls),
+            "error_rate": round(self.error_rate(), 3),
+            "p50_s": self.latency(0.5),
+            "p95_s": self.latency(0.95),
+            "cancelled": self.cancelled,
+            "available": self.available(),
+        }
+
+
+_stats = {provider: ProviderStats() for provider in PROVIDERS}
+_lock = threading.Lock()
+
+
+def record(provider, seconds, ok):
+    with _lock:
+        _stats.setdefault(provider, ProviderStats()).record(seconds, ok)
+
+
+def record_cancelled(provider):
+    """Count a call cancelled before it answered (a hedge loser) without touching its latency."""
+    with _lock:
+        _stats.setdefault(provider, ProviderStats()).cancelled += 1
+
+
+def expected_seconds(stats):
+    """
+    Median latency inflated by the error rate. Until a provider has answered, its median is
+    assumed to be HEDGE_DEFAULT_SECONDS, so unmeasured and always-failing providers rank behind
+    measured ones instead of ahead of them.
+
+    >>> unknown, failing, fast = ProviderStats(), ProviderStats(), ProviderStats()
+    >>> failing.record(0.1, ok=False)
+    >>> fast.record(1.0, ok=True)
+    >>> expected_seconds(fast) < expected_seconds(unknown) < expected_seconds(failing)
+    True
+    """
+    p50 = stats.latency(0.5)
+    return (p50 if p50 is not None else HEDGE_DEFAULT_SECONDS) * (1 + 4 * stats.error_rate())
+
+
+def route():
+    """
+    Providers to try for llm="auto", best first.
+
+    Ejected providers (too many consecutive errors) go last; the rest are ranked by
+    expected_seconds(), ties keeping the PROVIDERS order.
+    """
+    with _lock:
+        def score(indexed):
+            index, provider = indexed
+            stats = _stats[provider]
+            return (not stats.available(), expected_seconds(stats), index)
+
+        return [provider for _, provider in sorted(enumerate(PROVIDERS), key=score)]
+
+
+def hedge_delay(provider):
+    """How long to wait on `provider` before firing a hedged request: its p95, with a floor."""
+    with _lock:
+        p95 = _stats[provider].latency(0.95)
+    return max(HEDGE_MIN_SECONDS, p95 if p95 is not None else HEDGE_DEFAULT_SECONDS)
+
+
+def router_stats():
+    with _lock:
+        return {provider: stats.summary() for provider, stats in _stats.items()}
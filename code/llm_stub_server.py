@@ -0,0 +1,256 @@
+"""
+Local stand-in for the Llama endpoint, for load tests and benchmarks without the real server.
+
+    python code/llm_stub_server.py --port 8088 --latency 0.8 --jitter 0.4 --error-rate 0.05
+    LLAMA_API_URL=http://127.0.0.1:8088/v1/chat/completions shiny run milestone4/app.py
+
+Speaks the /v1/chat/completions protocol used by llm_connect (plain and "stream": true), and
+answers with canned replies shaped like the real ones: a JSON object for resume parsing and job
+metadata, a bare number for score prompts and generated prose for everything else. Latency,
+streaming speed and injected errors are drawn from a seeded generator, so runs are reproducible.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "the candidate brings solid experience in cloud infrastructure and distributed systems with "
+    "clear ownership of delivery strong communication and a track record of mentoring engineers "
+    "across teams while keeping reliability and cost in view"
+).split()
+SKILLS = ["Python", "AWS", "Kubernetes", "Terraform", "Docker", "SQL", "Go", "Linux", "Kafka", "React"]
+
+
+class StubSettings:
+    def __init__(self, latency=0.5, jitter=0.0, distribution="lognormal", token_delay=0.01,
+                 error_rate=0.0, error_statuses=(503,), hang_rate=0.0, seed=0):
+        self.latency = latency  # median seconds before the reply (or first streamed token)
+        self.jitter = jitter  # spread: sigma for lognormal, +/- fraction for uniform
+        self.distribution = distribution
+        self.token_delay = token_delay  # seconds between streamed fragments
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.hang_rate = hang_rate  # requests that never answer, to exercise client timeouts
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.served = 0
+        self.failed = 0
+
+    def delay(self):
+        with self._lock:
+            if self.distribution == "fixed" or not self.jitter:
+                return self.latency
+            if self.distribution == "uniform":
+                return max(0.0, self.latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter))
+            return self.latency * self._rng.lognormvariate(0, self.jitter)
+
+    def outcome(self):
+        """"ok", "hang" or an HTTP error status for the next request."""
+        with self._lock:
+            draw = self._rng.random()
+            if draw < self.hang_rate:
+                return "hang"
+            if draw < self.hang_rate + self.error_rate:
+                return self._rng.choice(self.error_statuses)
+            return "ok"
+
+    def count(self, ok):
+        with self._lock:
+            if ok:
+                self.served += 1
+            else:
+                self.failed += 1
+
+    def rng(self):
+        # Per-request generator, so concurrent replies don't interleave draws from the shared one
+        with self._lock:
+            return random.Random(self._rng.getrandbits(64))
+
+
+def canned_reply(messages, max_tokens, rng):
+    """A reply in the shape the app expects for this prompt."""
+    prompt = "\n".join(m.get("content", "") for m in messages)
+
+    if "Only return the number" in prompt:
+        return str(rng.randint(4, 9))
+
+    if '"job_title"' in prompt:
+        return json.dumps({"job_title": "Senior Software Engineer", "specialization": "Cloud Infrastructure",
+                           "years_required": rng.randint(2, 8)}, indent=2)
+
+    if "valid JSON object" in prompt:
+        name = rng.choice(["Alex Kim", "Jordan Lee", "Sam Patel", "Riley Chen", "Morgan Diaz"])
+        return json.dumps({
+            "Name": name,
+            "Email": f"{name.lower().replace(' ', '.')}@example.com",
+            "Years of Experience": rng.randint(1, 15),
+            "Key Skills": rng.sample(SKILLS, 5),
+            "Llama Score": rng.randint(3, 9),
+        }, indent=2)
+
+    n_words = max(1, min(max_tokens, 400) * 3 // 4)
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    sentences = [" ".join(words[i:i + 14]).capitalize() + "." for i in range(0, len(words), 14)]
+    return "\n\n".join(" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4))
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    settings = StubSettings()
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/models"):
+            self._json(200, {"status": "ok", "served": self.settings.served, "failed": self.settings.failed})
+        else:
+            self._json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "Not found"}})
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._json(401, {"error": {"message": "Missing bearer token"}})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._json(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        settings = self.settings
+        outcome = settings.outcome()
+        if outcome == "hang":
+            time.sleep(3600)
+            return
+        time.sleep(settings.delay())
+        if outcome != "ok":
+            settings.count(ok=False)
+            headers = {"Retry-After": "1"} if outcome == 429 else {}
+            self._json(outcome, {"error": {"message": f"Injected error {outcome}"}}, headers)
+            return
+
+        messages = request.get("messages") or []
+        model = request.get("model", "llama-3")
+        reply = canned_reply(messages, int(request.get("max_tokens") or 4000), settings.rng())
+        settings.count(ok=True)
+        if request.get("stream"):
+            self._stream(reply, model)
+            return
+
+        prompt_tokens = _tokens("".join(m.get("content", "") for m in messages))
+        self._json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": _tokens(reply),
+                "total_tokens": prompt_tokens + _tokens(reply),
+            },
+        })
+
+    def _stream(self, reply, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")  # no Content-Length: the stream ends with the connection
+        self.end_headers()
+        self.close_connection = True
+        stream_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        try:
+            for fragment in re.findall(r"\S+\s*", reply):
+                chunk = {
+                    "id": stream_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": fragment}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(self.settings.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-stream
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _StubServer(ThreadingHTTPServer):
+    request_queue_size = 128  # the default backlog of 5 refuses connections under load
+
+
+def serve(host="127.0.0.1", port=8088, settings=None, verbose=False):
+    """Start the stub in a background thread. Returns the server; its URL is server.url."""
+    handler = type("Handler", (StubHandler,), {"settings": settings or StubSettings()})
+    server = _StubServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    server.url = f"http://{host}:{server.server_port}/v1/chat/completions"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.5, help="Median seconds before replying")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency spread (lognormal sigma or uniform fraction)")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed fragments")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, nargs="+", default=[503], help="Statuses used for injected errors")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that never answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    settings = StubSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        distribution=args.distribution,
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        error_statuses=tuple(args.error_status),
+        hang_rate=args.hang_rate,
+        seed=args.seed,
+    )
+    server = serve(args.host, args.port, settings, args.verbose)
+    print(f"🧪 Stub LLM listening on {server.url}", file=sys.stderr)
+    print(f"   export LLAMA_API_URL={server.url}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import fitz
+
+RESUME_TEXT_CACHE_PATH = os.getenv(
+    "RESUME_TEXT_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "milestone2", "data", "resume_text.db")),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resume_text (
+    sha256 TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    metadata TEXT NOT NULL,
+    extracted REAL NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_conn = None
+_hashes = {}  # path -> ((mtime_ns, size), sha256), so unchanged files are not re-hashed
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(RESUME_TEXT_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(RESUME_TEXT_CACHE_PATH, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def file_hash(path):
+    """SHA-256 of the file's bytes, recomputed only when its size or modification time changes."""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    _hashes[path] = (signature, digest.hexdigest())
+    return _hashes[path][1]
+
+
+def _extract(path):
+    # The context manager closes the document (and its file handle) when done
+    with fitz.open(path) as doc:
+        return {
+            "text": "\n".join(page.get_text() for page in doc),
+            "pages": doc.page_count,
+            "metadata": {k: v for k, v in (doc.metadata or {}).items() if v},
+        }
+
+
+def get_resume_text(path):
+    """
+    Extracted text, page count and PDF metadata of a resume, as a dict with a "sha256" key.
+
+    Results are stored by the hash of the file's content, so PyMuPDF only runs the first time a
+    given resume is seen; later calls (and other worker processes) read the stored text.
+    Raises the usual OSError / PyMuPDF errors for missing or unreadable files.
+    """
+    sha256 = file_hash(path)
+    with _lock:
+        row = _connect().execute(
+            "SELECT text, pages, metadata FROM resume_text WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+    if row is not None:
+        return {"sha256": sha256, "text": row[0], "pages": row[1], "metadata": json.loads(row[2])}
+
+    resume = {"sha256": sha256, **_extract(path)}
+    with _lock:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resume_text (sha256, text, pages, metadata, extracted) VALUES (?, ?, ?, ?, ?)",
+                (sha256, resume["text"], resume["pages"], json.dumps(resume["metadata"]), time.time()),
+            )
+    return resume
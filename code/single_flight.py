@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is still running wait
+    for and share its result (or exception). Nothing is cached once the call finishes.
+    """
+
+    def __init__(self):
+        self.shared = 0  # calls answered by another caller's execution
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call, for threads
+        self._tasks = {}  # (event loop, key) -> asyncio.Task
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """Async version of do(); `fn` returns an awaitable. Waiters on the same event loop share it."""
+        slot = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(slot)
+            if task is None:
+                task = self._tasks[slot] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._forget(slot))
+            else:
+                self.shared += 1
+        # Shielded: one waiter going away must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, slot):
+        with self._lock:
+            self._tasks.pop(slot, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class TaskGraph:
+    """
+    Small dependency graph of pipeline stages, run on a thread pool.
+
+    Each stage is a function called with the results of its dependencies as keyword arguments.
+    A stage starts as soon as all of its dependencies have finished, so independent stages run
+    in parallel. The first failing stage stops the run: its exception is raised right away, stages
+    not yet started are cancelled, and stages already running finish in the background.
+
+        graph = TaskGraph()
+        graph.add("text", load_text)
+        graph.add("summary", lambda text: summarize(text), deps=("text",))
+        results = graph.run()
+        graph.timings  # {"text": {"start_s": 0.0, "seconds": 0.4}, ...}
+    """
+
+    def __init__(self):
+        self._stages = {}  # name -> (fn, deps), in insertion order
+        self.timings = {}
+
+    def add(self, name, fn, deps=()):
+        missing = [dep for dep in deps if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stage(s): {', '.join(missing)}")
+        self._stages[name] = (fn, tuple(deps))
+        return self
+
+    def run(self, max_workers=None):
+        """Run every stage. Returns {stage name: result}."""
+        results = {}
+        self.timings = {}
+        started = time.perf_counter()
+        waiting = dict(self._stages)
+        running = {}  # future -> stage name
+
+        def timed(name, fn, kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(**kwargs)
+            finally:
+                self.timings[name] = {
+                    "start_s": round(start - started, 4),
+                    "seconds": round(time.perf_counter() - start, 4),
+                }
+
+        pool = ThreadPoolExecutor(max_workers=max_workers or len(self._stages) or 1, thread_name_prefix="stage")
+        while waiting or running:
+            for name, (fn, deps) in list(waiting.items()):
+                if all(dep in results for dep in deps):
+                    del waiting[name]
+                    kwargs = {dep: results[dep] for dep in deps}
+                    running[pool.submit(timed, name, fn, kwargs)] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    # Don't wait for running siblings: their results are no longer needed
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise error
+                results[name] = future.result()
+        pool.shutdown()
+
+        self.timings["total"] = {"start_s": 0.0, "seconds": round(time.perf_counter() - started, 4)}
+        return results
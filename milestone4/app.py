@@ -2,6 +2,12 @@ from shiny import App
 from shiny.ui import page_navbar
 from shiny import ui
 import os
+import sys
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+# Access ../code (llm_metrics, context, ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "code")))
 
 from ui import (
     home,
@@ -22,6 +28,7 @@ from server import (
     plot_generation as plot_generation_srv,
     document_creation as document_creation_srv  # 👈 NEW
 )
+from llm_metrics import prometheus_text, summary
 
 ui = ui.page_fluid(
     # HEAD TAGS (global styles/fonts/scripts)
@@ -87,3 +94,21 @@ def server(input, output, session):
     document_creation_srv.server(input, output, session)
 
 app = App(ui, server, static_assets={'/static': os.path.join(os.path.dirname(__file__), "styles")})
+
+
+# LLM call metrics: Prometheus scrape endpoint and a per-call-site JSON summary (?window=seconds)
+def metrics(request):
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+def metrics_summary(request):
+    window = request.query_params.get("window")
+    return JSONResponse(summary(float(window) if window else None))
+
+
+# Added to Shiny's own router (ahead of its catch-all mount), so `app` stays the Shiny App
+# and keeps its lifespan handling
+app.starlette_app.router.routes[:0] = [
+    Route("/metrics", metrics),
+    Route("/metrics/summary", metrics_summary),
+]
@@ -1,10 +1,18 @@
+import asyncio
 import os
-import fitz
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from shiny import reactive, render, ui
-from context import get_candidate_context, save_candidate_context, get_team_summary, get_job_context, get_all_jobs, get_all_candidates
+from context import get_candidate_context, update_candidate_context, get_all_jobs, get_candidates_for_job
+from server.context_events import job_ids_changed, job_candidates_changed
 from llm_connect import get_response
+from job_brief import full_context, get_job_brief, job_inputs
+from resume_text import get_resume_text
+from single_flight import SingleFlight
+from task_graph import TaskGraph
 import html
 import markdown
 
@@ -13,26 +21,33 @@ RESUME_DIR = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "..", "milestone2", "data", "resumes")
 )
 
+# One evaluation per (candidate, job) at a time; other sessions asking for it wait and share the result
+_evaluations = SingleFlight()
+
+# Background "evaluate all pending" runs, one per job, shared by every session
+BULK_EVAL_WORKERS = int(os.getenv("BULK_EVAL_WORKERS", "4"))
+_bulk_pool = ThreadPoolExecutor(max_workers=BULK_EVAL_WORKERS, thread_name_prefix="bulk-eval")
+_bulk_runs = {}  # job_id -> BulkEvaluation
+_bulk_lock = threading.Lock()
+
 def extract_text_from_pdf(filename):
     path = os.path.join(RESUME_DIR, filename) + '.pdf'
     if not os.path.exists(path):
         print(f"❌ Resume not found: {path}")
         return None, None
     try:
-        doc = fitz.open(path)
-        return "\n".join([page.get_text() for page in doc]), path
+        # Extracted once per file content and reused by every later evaluation
+        return get_resume_text(path)["text"], path
     except Exception as e:
         print("❌ PDF error:", e)
         return None, None
 
-def parse_resume_with_llm(resume_text, job_description_text, team_profiles, team_summary):
+def parse_resume_with_llm(resume_text, job_brief):
     prompt = (
-        f"You are evaluating a candidate for the following job posting:\n\n"
-        f"{job_description_text}\n\n"
+        f"You are evaluating a candidate for the following job and team:\n\n"
+        f"{job_brief}\n\n"
         f"Here is the candidate's resume:\n\n"
         f"{resume_text}\n\n"
-        f"Here are the profiles of the current team members:\n\n{team_profiles}\n\n"
-        f"Here is the team summary:\n\n{team_summary}\n\n"
         "Extract the following fields into a valid JSON object:\n"
         "- Name\n"
         "- Email\n"
@@ -49,21 +64,24 @@ def parse_resume_with_llm(resume_text, job_description_text, team_profiles, team
         md=False,
         temperature=0.0,
         max_tokens=700,
+        cache=True,
+        validate=resume_json,
+        label="parse_resume_with_llm",
     )
+    return resume_json(response_text)
 
+def resume_json(response_text):
     response_text = response_text.strip().replace("```json", "").replace("```", "").strip()
     match = re.search(r'\{\s*".+?"\s*:.+?\}', response_text, re.DOTALL)
     if not match:
         raise ValueError("No valid JSON object found in LLM response.")
     return json.loads(match.group(0))
 
-def review_llama_score(resume_text, job_description_text, score, team_profiles, team_summary):
+def review_llama_score(resume_text, job_brief, score):
     prompt = (
-        f"You are evaluating a candidate for the following posting:\n\n"
-        f"{job_description_text}\n\n"
+        f"You are evaluating a candidate for the following job and team:\n\n"
+        f"{job_brief}\n\n"
         f"Resume:\n{resume_text}\n\n"
-        f"Team Profiles:\n{team_profiles}\n\n"
-        f"Team Summary:\n{team_summary}\n\n"
         f"Llama gave this candidate a score of {score}/10.\n"
         "What is your score (1–10)? Only return the number."
     )
@@ -75,15 +93,16 @@ def review_llama_score(resume_text, job_description_text, score, team_profiles,
         md=False,
         temperature=0.0,
         max_tokens=10,
-        model_name ='gemini-2.0-flash-lite'
+        model_name ='gemini-2.0-flash-lite',
+        cache=True,
+        validate=lambda response: int(response.strip()),
+        label="review_llama_score",
     ).strip()
 
-def summarize_entire_resume(resume_text, job_description_text, score, team_profiles, team_summary):
+def summarize_entire_resume(resume_text, job_brief, score):
     prompt = (
-        f"Job Description:\n{job_description_text}\n\n"
+        f"Job and Team:\n{job_brief}\n\n"
         f"Resume:\n{resume_text}\n\n"
-        f"Team Profiles:\n{team_profiles}\n\n"
-        f"Team Summary:\n{team_summary}\n\n"
         f"The candidate received a score of {score}/10.\n"
         "Write a detailed, honest summary of this candidate's qualifications and fit."
     )
@@ -94,17 +113,16 @@ def summarize_entire_resume(resume_text, job_description_text, score, team_profi
         llm="llama",
         md=False,
         temperature=0.7,
-        max_tokens=500
+        max_tokens=500,
+        label="summarize_entire_resume",
     ).strip()
 
-def review_llama_summary(resume_text, job_description_text, score, llama_review, team_profiles, team_summary):
+def review_llama_summary(resume_text, job_brief, score, llama_review):
     prompt = (
         f"You are reviewing this Llama summary for a candidate:\n\n"
-        f"Job Description:\n{job_description_text}\n\n"
+        f"Job and Team:\n{job_brief}\n\n"
         f"Resume:\n{resume_text}\n\n"
         f"Llama Summary:\n{llama_review}\n\n"
-        f"Team Profiles:\n{team_profiles}\n\n"
-        f"Team Summary:\n{team_summary}\n\n"
         f"Llama scored this candidate {score}/10.\n"
         "Write your own short evaluation and state if you agree or disagree with Llama’s score."
     )
@@ -115,21 +133,192 @@ def review_llama_summary(resume_text, job_description_text, score, llama_review,
         llm="gemini",
         md=False,
         temperature=0.7,
-        max_tokens=500
+        max_tokens=500,
+        label="review_llama_summary",
     ).strip()
 
+def evaluation_graph(job_id, filename):
+    """
+    The evaluation pipeline as a TaskGraph. Resume text and job brief load in parallel; after
+    parsing, the Gemini score and the Llama summary run side by side, and the Gemini review
+    waits for the summary. Three LLM round-trips end to end instead of four.
+    """
+    def resume():
+        resume_text, resume_path = extract_text_from_pdf(filename)
+        if not resume_text:
+            raise ValueError("Failed to extract resume.")
+        return resume_text
+
+    def brief():
+        # Shared digest of the job and team instead of re-sending all of it in every prompt
+        try:
+            return get_job_brief(job_id)
+        except Exception as e:
+            print(f"⚠️ Job brief unavailable, using the full job context: {e}")
+            return full_context(*job_inputs(job_id))
+
+    def parsed(resume, brief):
+        try:
+            return parse_resume_with_llm(resume, brief)
+        except Exception as e:
+            raise ValueError(f"❌ LLM field extraction failed: {e}")
+
+    def gemini_score(resume, brief, parsed):
+        score = review_llama_score(resume, brief, parsed["Llama Score"])
+        try:
+            return int(score)
+        except:
+            return None
+
+    def llama_summary(resume, brief, parsed):
+        return summarize_entire_resume(resume, brief, parsed["Llama Score"])
+
+    def gemini_review(resume, brief, parsed, llama_summary):
+        return review_llama_summary(resume, brief, parsed["Llama Score"], llama_summary)
+
+    graph = TaskGraph()
+    graph.add("resume", resume)
+    graph.add("brief", brief)
+    graph.add("parsed", parsed, deps=("resume", "brief"))
+    graph.add("gemini_score", gemini_score, deps=("resume", "brief", "parsed"))
+    graph.add("llama_summary", llama_summary, deps=("resume", "brief", "parsed"))
+    graph.add("gemini_review", gemini_review, deps=("resume", "brief", "parsed", "llama_summary"))
+    return graph
+
+
+def evaluate_candidate(candidate_id, job_id, filename):
+    """
+    Run the four-call LLM evaluation of one resume against one job and save it to the context.
+
+    Concurrent calls for the same (candidate, job) share a single run. Returns the saved fields;
+    raises ValueError with a user-facing message when the resume or the LLM output is unusable.
+    """
+    return _evaluations.do((candidate_id, job_id), lambda: _evaluate_candidate(candidate_id, job_id, filename))
+
+
+def _evaluate_candidate(candidate_id, job_id, filename):
+    graph = evaluation_graph(job_id, filename)
+    stages = graph.run()
+    timings = ", ".join(f"{name} {t['seconds']:.1f}s" for name, t in graph.timings.items())
+    print(f"⏱️ Evaluated {candidate_id}: {timings}")
+
+    parsed = stages["parsed"]
+    llama_score = parsed["Llama Score"]
+    gemini_score = stages["gemini_score"]
+    avg_score = (
+        (llama_score + gemini_score) / 2
+        if isinstance(llama_score, int) and isinstance(gemini_score, int)
+        else "N/A"
+    )
+    llama_summary = stages["llama_summary"]
+    gemini_review = stages["gemini_review"]
+
+    # ✅ Save new result (re-applied on top of any note/tag saved while the LLMs were running)
+    result = {
+        "job_id": job_id,
+        "Resume File": filename,
+        "Name": parsed.get("Name"),
+        "Email": parsed.get("Email"),
+        "Years of Experience": parsed.get("Years of Experience"),
+        "Key Skills": parsed.get("Key Skills", []),
+        "Llama Score": llama_score,
+        "Gemini Score": gemini_score,
+        "avg_score": avg_score,
+        "Llama Summary": llama_summary,
+        "Gemini Summary": gemini_review
+    }
+    update_candidate_context(candidate_id, lambda c: c.update(result), hydrate=False)
+    return result
+
+
+def pending_candidates(job_id):
+    """Candidates of a job with a resume but no evaluation yet, as {candidate_id: resume filename}."""
+    return {
+        cid: os.path.splitext(c["Resume File"])[0]
+        for cid, c in get_candidates_for_job(job_id).items()
+        if c.get("Resume File") and "Llama Summary" not in c
+    }
+
+
+class BulkEvaluation:
+    """Progress of one background run over a job's pending candidates."""
+
+    def __init__(self, job_id, candidates):
+        self.job_id = job_id
+        self.total = len(candidates)
+        self.succeeded = 0
+        self.failed = {}  # candidate_id -> error message
+        self.cancelled = 0
+        self.started = time.time()
+        self.finished = None if candidates else self.started
+        self._lock = threading.Lock()
+        # Each result is saved by evaluate_candidate as soon as it completes
+        self._futures = [
+            _bulk_pool.submit(self._evaluate, cid, filename) for cid, filename in candidates.items()
+        ]
+
+    @property
+    def running(self):
+        return self.finished is None
+
+    @property
+    def completed(self):
+        return self.succeeded + len(self.failed) + self.cancelled
+
+    def _evaluate(self, candidate_id, filename):
+        try:
+            evaluate_candidate(candidate_id, self.job_id, filename)
+            self._settle(succeeded=1)
+        except Exception as e:
+            print(f"❌ Bulk evaluation of {candidate_id} failed: {e}")
+            self._settle(error=(candidate_id, str(e)))
+
+    def _settle(self, succeeded=0, cancelled=0, error=None):
+        with self._lock:
+            self.succeeded += succeeded
+            self.cancelled += cancelled
+            if error:
+                self.failed[error[0]] = error[1]
+            if self.completed == self.total:
+                self.finished = time.time()
+                print(f"✅ Bulk evaluation of job {self.job_id}: {self.succeeded} done, {len(self.failed)} failed")
+
+    def cancel(self):
+        """Drop the candidates that have not started; running evaluations finish and are saved."""
+        for future in self._futures:
+            if future.cancel():
+                self._settle(cancelled=1)
+
+
+def start_bulk_evaluation(job_id):
+    """Start evaluating every pending candidate of a job in the background, unless a run is active."""
+    with _bulk_lock:
+        run = _bulk_runs.get(job_id)
+        if run is None or not run.running:
+            run = _bulk_runs[job_id] = BulkEvaluation(job_id, pending_candidates(job_id))
+        return run
+
+
+def get_bulk_evaluation(job_id):
+    with _bulk_lock:
+        return _bulk_runs.get(job_id)
+
+
 def server(input, output, session):
 
 
     @reactive.effect
     def _populate_job_dropdown():
+        job_ids_changed()
         jobs = get_all_jobs()
         job_choices = {
             k: f"{v.get('title', 'Untitled')} ({k[:8]})"
             for k, v in jobs.items()
         }
         print(job_choices)
-        ui.update_select("job_dropdown_for_doc", choices=job_choices)
+        with reactive.isolate():
+            selected = input.job_dropdown_for_doc()
+        ui.update_select("job_dropdown_for_doc", choices=job_choices, selected=selected if selected in job_choices else None)
 
 
     @reactive.effect
@@ -141,18 +330,21 @@ def server(input, output, session):
             ui.update_select("candidate_dropdown_for_doc", choices={"⬅️ Select a job first": ""})
             return
 
-        candidates = get_all_candidates()
+        job_candidates_changed(job_id)
+        candidates = get_candidates_for_job(job_id)
 
         filtered = {
             cid: f"{v.get('Name', cid)} ({v.get('Resume File', 'N/A')})"
             for cid, v in candidates.items()
-            if v.get("job_id") == job_id and v.get("Resume File")
+            if v.get("Resume File")
         }
 
         print(f"✅ Found {len(filtered)} candidates for job {job_id}")
 
         if filtered:
-            ui.update_select("candidate_dropdown_for_doc", choices=filtered)
+            with reactive.isolate():
+                selected = input.candidate_dropdown_for_doc()
+            ui.update_select("candidate_dropdown_for_doc", choices=filtered, selected=selected if selected in filtered else None)
         else:
             ui.update_select("candidate_dropdown_for_doc", choices={"❌ No matching resumes": ""})
 
@@ -161,7 +353,7 @@ def server(input, output, session):
 
     @output
     @render.ui
-    def summary():
+    async def summary():
         input.show_gemini()             # ✅ force reactive trigger
         input.job_dropdown_doc()
         input.candidate_dropdown_doc()
@@ -173,11 +365,6 @@ def server(input, output, session):
         if not filename or not job_id:
             return "Please select both resume and job ID."
 
-        job_context = get_job_context(job_id)  # ✅ This now works
-        job_description_text = job_context.get("job_description", "No job description available.")
-        team_profiles = job_context.get("team_profiles", "No team profile available.")
-        team_summary = get_team_summary()
-
         candidate_id = os.path.splitext(filename)[0]
         ctx = get_candidate_context(candidate_id)
 
@@ -204,51 +391,14 @@ def server(input, output, session):
                 """
             )
 
-        # ✅ Run full pipeline
-        resume_text, resume_path = extract_text_from_pdf(filename)
-        if not resume_text:
-            return "Failed to extract resume."
-
+        # ✅ Run full pipeline off the event loop, so other sessions stay responsive
         try:
-            parsed = parse_resume_with_llm(resume_text, job_description_text, team_profiles, team_summary)
-        except Exception as e:
-            return f"❌ LLM field extraction failed: {e}"
-
-        llama_score = parsed["Llama Score"]
-        gemini_score = review_llama_score(resume_text, job_description_text, llama_score, team_profiles, team_summary)
-        try:
-            gemini_score = int(gemini_score)
-        except:
-            gemini_score = None
-
-        avg_score = (
-            (llama_score + gemini_score) / 2
-            if isinstance(llama_score, int) and isinstance(gemini_score, int)
-            else "N/A"
-        )
-
-        llama_summary = summarize_entire_resume(resume_text, job_description_text, llama_score, team_profiles, team_summary)
-        gemini_review = review_llama_summary(resume_text, job_description_text, llama_score, llama_summary, team_profiles, team_summary)
-
-        # ✅ Save new result
-        ctx.update({
-            "job_id": job_id,
-            "Resume File": filename,
-            "Name": parsed.get("Name"),
-            "Email": parsed.get("Email"),
-            "Years of Experience": parsed.get("Years of Experience"),
-            "Key Skills": parsed.get("Key Skills", []),
-            "Llama Score": llama_score,
-            "Gemini Score": gemini_score,
-            "avg_score": avg_score,
-            "Llama Summary": llama_summary,
-            "Gemini Summary": gemini_review
-        })
-
-        save_candidate_context(candidate_id, ctx)
+            result = await asyncio.to_thread(evaluate_candidate, candidate_id, job_id, filename)
+        except ValueError as e:
+            return str(e)
 
         print(use_gemini)
-        summary_text = gemini_review if use_gemini else llama_summary
+        summary_text = result["Gemini Summary"] if use_gemini else result["Llama Summary"]
         rendered = markdown.markdown(summary_text)
 
 
@@ -276,7 +426,7 @@ def server(input, output, session):
             return ui.HTML("<p style='color: #888;'>Select a resume and job to view score.</p>")
 
         candidate_id = os.path.splitext(filename)[0]
-        ctx = get_candidate_context(candidate_id)
+        ctx = get_candidate_context(candidate_id, hydrate=False)
 
         if ctx.get("job_id") == job_id and "avg_score" in ctx:
             score = ctx["avg_score"]
@@ -317,7 +467,7 @@ def server(input, output, session):
             return ui.input_text_area("candidate_note", "Add a note:", rows=3)
 
         candidate_id = os.path.splitext(filename)[0]
-        ctx = get_candidate_context(candidate_id)
+        ctx = get_candidate_context(candidate_id, hydrate=False)
         note = ctx.get("Note", "") if ctx.get("job_id") == job_id else ""
         return ui.input_text_area("candidate_note", "Add a note:", value=note, rows=3)
 
@@ -330,7 +480,7 @@ def server(input, output, session):
             return ui.input_text("candidate_tags", "Tags (comma-separated):")
 
         candidate_id = os.path.splitext(filename)[0]
-        ctx = get_candidate_context(candidate_id)
+        ctx = get_candidate_context(candidate_id, hydrate=False)
         tags = ", ".join(ctx.get("Tags", [])) if ctx.get("job_id") == job_id else ""
         return ui.input_text("candidate_tags", "Tags (comma-separated):", value=tags)
 
@@ -344,7 +494,7 @@ def server(input, output, session):
             return ""
 
         candidate_id = os.path.splitext(filename)[0]
-        ctx = get_candidate_context(candidate_id)
+        ctx = get_candidate_context(candidate_id, hydrate=False)
 
         if ctx.get("job_id") != job_id:
             return ""
@@ -353,6 +503,60 @@ def server(input, output, session):
         tags = ctx.get("Tags", [])
         return f"📝 Note:\n{note}\n\n🏷️ Tags: {', '.join(tags)}"
     
+    @reactive.effect
+    @reactive.event(input.bulk_evaluate)
+    def _start_bulk_evaluation():
+        job_id = input.job_dropdown_for_doc()
+        if not job_id:
+            ui.notification_show("Select a job first.", type="warning")
+            return
+        run = start_bulk_evaluation(job_id)
+        if not run.total:
+            ui.notification_show("No pending candidates for this job.", type="message")
+
+    @reactive.effect
+    @reactive.event(input.bulk_cancel)
+    def _cancel_bulk_evaluation():
+        run = get_bulk_evaluation(input.job_dropdown_for_doc())
+        if run is not None and run.running:
+            run.cancel()
+
+    @output
+    @render.ui
+    def bulk_progress():
+        input.bulk_evaluate()
+        input.bulk_cancel()
+        job_id = input.job_dropdown_for_doc()
+        if not job_id:
+            return ui.HTML("<p style='color: #888;'>Select a job to evaluate its candidates.</p>")
+
+        run = get_bulk_evaluation(job_id)
+        if run is None or not run.running:
+            job_candidates_changed(job_id)
+            pending = len(pending_candidates(job_id))
+            last = ""
+            if run is not None and run.total:
+                last = (
+                    f" Last run: {run.succeeded} evaluated, {len(run.failed)} failed"
+                    f"{f', {run.cancelled} cancelled' if run.cancelled else ''}"
+                    f" in {run.finished - run.started:.0f}s."
+                )
+            return ui.HTML(f"<p style='color: #888;'>{pending} candidate(s) pending evaluation.{last}</p>")
+
+        # Poll the shared run while it is active; results themselves arrive through the context events
+        reactive.invalidate_later(1)
+        percent = int(100 * run.completed / run.total)
+        return ui.HTML(f"""
+            <div class="progress" style="height: 1.2rem;">
+                <div class="progress-bar progress-bar-striped progress-bar-animated" style="width: {percent}%;">
+                    {run.completed}/{run.total}
+                </div>
+            </div>
+            <p style="color: #888; margin-top: 0.4rem;">
+                ⏳ {run.succeeded} evaluated, {len(run.failed)} failed, {time.time() - run.started:.0f}s elapsed
+            </p>
+        """)
+
     @output
     @render.text
     @reactive.event(input.save_note_tags)
@@ -363,7 +567,7 @@ def server(input, output, session):
             return "❌ Please select both a resume and a job ID."
 
         candidate_id = os.path.splitext(filename)[0]
-        ctx = get_candidate_context(candidate_id)
+        ctx = get_candidate_context(candidate_id, hydrate=False)
 
         # Only update if job_id matches
         if ctx.get("job_id") != job_id:
@@ -375,9 +579,7 @@ def server(input, output, session):
         tags = [tag.strip() for tag in tags_raw.split(",") if tag.strip()]
 
         # Save to context
-        ctx["Note"] = note
-        ctx["Tags"] = tags
-        save_candidate_context(candidate_id, ctx)
+        update_candidate_context(candidate_id, lambda c: c.update({"Note": note, "Tags": tags}), hydrate=False)
 
         return "✅ Note and tags saved."
 
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import time
+
+from shiny import reactive
+
+from context import get_all_candidates, get_all_jobs, get_job_ids_with_candidates, load_context, subscribe
+
+# Seconds between checks for changes made by other worker processes; 0 turns the watcher off
+CONTEXT_WATCH_INTERVAL = float(os.getenv("CONTEXT_WATCH_INTERVAL", "5"))
+
+# Shared by every session in this worker: bumped whenever the context layer reports a change,
+# so dropdowns refresh across all open sessions without polling or page reloads.
+_jobs_version = reactive.Value(0)
+_candidates_version = reactive.Value(0)
+_job_ids_version = reactive.Value(0)
+_job_candidates_versions = {}  # job_id -> reactive.Value, created on first use
+
+_loop = None
+_job_ids = None  # last seen job_ids_fingerprint()
+
+
+def jobs_changed():
+    """Reactive dependency on any job record."""
+    _remember_loop()
+    return _jobs_version()
+
+
+def candidates_changed():
+    """Reactive dependency on any candidate record."""
+    _remember_loop()
+    return _candidates_version()
+
+
+def job_candidates_changed(job_id):
+    """
+    Reactive dependency on the candidates of one job. Saves to other jobs' candidates don't
+    invalidate it; a clear or a change from another process invalidates every job.
+    """
+    _remember_loop()
+    if job_id not in _job_candidates_versions:
+        _job_candidates_versions[job_id] = reactive.Value(0)
+    return _job_candidates_versions[job_id]()
+
+
+def job_ids_changed():
+    """
+    Reactive dependency on the jobs offered in dropdowns: the job ids and titles, and which jobs
+    have candidates. Unlike jobs_changed() it is not invalidated by edits to the records themselves
+    (evaluations, job briefs, offers), so dropdowns are not rebuilt on every save.
+    """
+    global _job_ids
+    _remember_loop()
+    if _job_ids is None:
+        _job_ids = job_ids_fingerprint()
+    return _job_ids_version()
+
+
+def job_ids_fingerprint():
+    jobs = get_all_jobs()
+    return (
+        frozenset((job_id, job.get("title")) for job_id, job in jobs.items()),
+        get_job_ids_with_candidates(),
+    )
+
+
+def _remember_loop():
+    global _loop
+    if _loop is None:
+        _loop = asyncio.get_running_loop()
+        if CONTEXT_WATCH_INTERVAL > 0:
+            threading.Thread(target=_watch, name="context-watch", daemon=True).start()
+
+
+def _watch():
+    # Other workers write to the same store, but their changes are only noticed when this worker
+    # reads it. Reading regularly turns them into a "reload" event, at most one interval late.
+    while True:
+        time.sleep(CONTEXT_WATCH_INTERVAL)
+        try:
+            load_context()
+        except Exception as e:
+            print(f"⚠️ Context watcher could not read the store: {e}")
+
+
+def _on_change(changes):
+    if _loop is None:
+        return  # no session has subscribed yet
+
+    ops = {c["op"] for c in changes}
+    sections = {c.get("section") for c in changes}
+    everything = bool(ops & {"clear", "reload"})
+
+    values = []
+    if everything or "jobs" in sections:
+        values.append(_jobs_version)
+    if everything or "candidates" in sections:
+        values.append(_candidates_version)
+    candidate_ids = {c["key"] for c in changes if c.get("section") == "candidates"}
+
+    # Saves can come from any thread (e.g. background evaluation), so hop onto the event loop
+    if values:
+        _loop.call_soon_threadsafe(lambda: asyncio.ensure_future(_bump(values, candidate_ids, everything)))
+
+
+async def _bump(values, candidate_ids, everything):
+    global _job_ids
+    async with reactive.lock():
+        # Only compared here, on the event loop, so concurrent saves can't bump it out of order
+        job_ids = job_ids_fingerprint()
+        if job_ids != _job_ids:
+            _job_ids = job_ids
+            values = values + [_job_ids_version]
+        if everything:
+            values = values + list(_job_candidates_versions.values())
+        elif candidate_ids:
+            candidates = get_all_candidates()
+            touched = {candidates.get(cid, {}).get("job_id") for cid in candidate_ids}
+            values = values + [v for job_id, v in _job_candidates_versions.items() if job_id in touched]
+        with reactive.isolate():
+            for value in values:
+                value.set(value() + 1)
+        await reactive.flush()
+
+
+subscribe(_on_change)
@@ -1,16 +1,16 @@
-import os
 import json
 import pandas as pd
 import numpy as np
-import ast
 from dotenv import load_dotenv
 from shiny import reactive, render, ui
-import google.generativeai as genai
 from google.generativeai.types import FunctionDeclaration, Tool
 from google.api_core.exceptions import ResourceExhausted
 import markdown
 
-from context import get_all_candidates, get_all_jobs
+from context import get_all_jobs, get_job_ids_with_candidates
+from candidate_frames import get_candidate_frame
+from server.context_events import job_ids_changed, job_candidates_changed
+from llm_connect import get_gemini_model, send_chat_message
 
 load_dotenv()
 
@@ -43,8 +43,7 @@ correlation_func_schema = FunctionDeclaration(
     }
 )
 correlation_tool = Tool(function_declarations=[correlation_func_schema])
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash", tools=[correlation_tool])
+TOOLS = [correlation_tool]
 
 # === Server ===
 def server(input, output, session):
@@ -57,8 +56,8 @@ def server(input, output, session):
 
     @reactive.effect
     def _populate_job_ids():
-        raw_candidates = get_all_candidates()
-        job_ids_used = {c.get("job_id") for c in raw_candidates.values() if "job_id" in c}
+        job_ids_changed()
+        job_ids_used = get_job_ids_with_candidates()
 
         all_jobs = get_all_jobs()
 
@@ -70,20 +69,18 @@ def server(input, output, session):
         }
 
         print(f"📊 Populating job_id dropdown with {len(job_choices)} items")
-        ui.update_select("job_id", choices=job_choices)
+        with reactive.isolate():
+            selected = input.job_id()
+        ui.update_select("job_id", choices=job_choices, selected=selected if selected in job_choices else None)
 
 
     @reactive.Calc
     def candidates():
-        raw = get_all_candidates()
         job_id = input.job_id()
         if not job_id:
             return pd.DataFrame()
-        df = pd.DataFrame([c for c in raw.values() if c.get("job_id") == job_id])
-        df["Years of Experience"] = pd.to_numeric(df["Years of Experience"], errors="coerce")
-        df["avg_score"] = pd.to_numeric(df["avg_score"], errors="coerce")
-        df["Key Skills"] = df["Key Skills"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-        return df
+        job_candidates_changed(job_id)
+        return get_candidate_frame(job_id)
 
     @reactive.effect
     def _populate_cols():
@@ -93,20 +90,26 @@ def server(input, output, session):
         exclude = {
             "Name", "Email", "Key Skills", "Candidate ID", "Application ID", "Resume File",
             "Llama Summary", "Gemini Summary", "Note", "candidate_id", "job_id",
-            "application_date", "source"
+            "application_date", "source", "onboarding_docs", "_version"
         }
         cols = [col for col in df.columns if col not in exclude]
-        ui.update_select("col1", choices=cols)
-        ui.update_select("col2", choices=cols)
+        # Candidate saves re-run this; keep the user's columns when they still exist
+        with reactive.isolate():
+            col1, col2 = input.col1(), input.col2()
+        ui.update_select("col1", choices=cols, selected=col1 if col1 in cols else None)
+        ui.update_select("col2", choices=cols, selected=col2 if col2 in cols else None)
 
     @output
     @render.table
     def candidate_table():
         df = candidates()
-        return df.drop(columns=["Resume File", "Llama Summary", "Gemini Summary", "onboarding_docs", "job_id", "Candidate ID"], errors="ignore").head(10)
+        return df.drop(columns=["Resume File", "Llama Summary", "Gemini Summary", "onboarding_docs", "job_id", "Candidate ID", "_version"], errors="ignore").head(10)
 
     @output
     @render.ui
+    # Only on a click (and once at start for the hint): the explanation is a Gemini call,
+    # so candidate saves must not re-run it
+    @reactive.event(input.calc_corr, ignore_none=False)
     def correlation_output():
         if input.calc_corr() == 0:
             return ui.p("⬇️ Select columns and click 'Calculate Correlation'.")
@@ -131,8 +134,8 @@ def server(input, output, session):
             f"Explain this for a recruiter: include statistical meaning, hiring implications, and limitations."
         )
         try:
-            chat = model.start_chat()
-            response = chat.send_message(prompt)
+            chat = get_gemini_model("gemini-2.0-flash", tools=TOOLS).start_chat()
+            response = send_chat_message(chat, prompt, label="correlation_explanation")
             explanation = markdown.markdown(response.text.strip())
         except Exception as e:
             explanation = f"<b>⚠️ Gemini error:</b> {str(e)}"
@@ -178,8 +181,8 @@ def server(input, output, session):
         )
 
         try:
-            chat = model.start_chat()
-            response = chat.send_message(prompt)
+            chat = get_gemini_model("gemini-2.0-flash", tools=TOOLS).start_chat()
+            response = send_chat_message(chat, prompt, label="correlation_chat")
             explanation = markdown.markdown(response.text.strip())
         except ResourceExhausted:
             explanation = "<b>❌ Gemini quota exceeded. Try again soon.</b>"
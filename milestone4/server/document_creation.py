@@ -4,11 +4,13 @@ from context import (
     get_candidate_context,
     get_job_context,
     get_team_summary,
-    save_candidate_context,
+    save_candidate_offer,
+    update_candidate_context,
     get_all_jobs,
-    get_all_candidates
+    get_candidates_for_job
 )
-from llm_connect import get_response
+from server.context_events import job_ids_changed, job_candidates_changed
+from llm_connect import astream_response
 
 from fpdf import FPDF
 import markdown
@@ -29,14 +31,14 @@ def draft_offer_letter(candidate_name, job_title, compensation, start_date, team
         "Avoid excessive legal language but maintain formality."
     )
 
-    return get_response(
+    return astream_response(
         input=prompt,
         template=lambda x: x,
         llm="llama",
-        md=False,
         temperature=0.5,
-        max_tokens=600
-    ).strip()
+        max_tokens=600,
+        label="draft_offer_letter",
+    )
 
 
 def generate_full_contract(candidate_name, job_title, compensation, start_date, clauses, company_policies, legal_notes):
@@ -53,27 +55,46 @@ def generate_full_contract(candidate_name, job_title, compensation, start_date,
         "Use formal legal language where appropriate."
     )
 
-    return get_response(
+    return astream_response(
         input=prompt,
         template=lambda x: x,
         llm="llama",
-        md=False,
         temperature=0.4,
-        max_tokens=1200
-    ).strip()
+        max_tokens=1200,
+        label="generate_full_contract",
+    )
+
+
+async def stream_and_save(chunks, save):
+    """Pass LLM fragments through to the page, then save the full text once the stream ends."""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        yield f"\n\n❌ LLM failed: {e}"
+        return
+    save("".join(parts).strip())
 
 
 def server(input, output, session):
+    offer_stream = ui.MarkdownStream("offer_letter_text")
+    contract_stream = ui.MarkdownStream("contract_text")
+
     # === Update job dropdown from context ===
     @reactive.effect
     def _populate_job_dropdown():
+        job_ids_changed()
         jobs = get_all_jobs()
         # value = job_id (UUID), label = title
         job_choices = {
             k: f"{v.get('title', 'Untitled')} ({k[:8]})"
             for k, v in jobs.items()
         }
-        ui.update_select("job_dropdown_doc", choices=job_choices)
+        with reactive.isolate():
+            selected = input.job_dropdown_doc()
+        ui.update_select("job_dropdown_doc", choices=job_choices, selected=selected if selected in job_choices else None)
 
 
     # === Update candidate dropdown based on selected job ===
@@ -86,19 +107,22 @@ def server(input, output, session):
             ui.update_select("candidate_dropdown_doc", choices={"⬅️ Select a job first": ""})
             return
 
-        candidates = get_all_candidates()
+        job_candidates_changed(job_id)
+        candidates = get_candidates_for_job(job_id)
 
         filtered = {
             cid: f"{v.get('Name', cid)} ({v.get('Resume File', 'N/A')})"
             for cid, v in candidates.items()
-            if v.get("job_id") == job_id and v.get("Resume File")
+            if v.get("Resume File")
         }
 
 
         print(f"✅ Found {len(filtered)} candidates for job {job_id}")
 
         if filtered:
-            ui.update_select("candidate_dropdown_doc", choices=filtered)
+            with reactive.isolate():
+                selected = input.candidate_dropdown_doc()
+            ui.update_select("candidate_dropdown_doc", choices=filtered, selected=selected if selected in filtered else None)
         else:
             ui.update_select("candidate_dropdown_doc", choices={"❌ No matching resumes": ""})
 
@@ -106,10 +130,9 @@ def server(input, output, session):
 
 
     # === Offer letter generation ===
-    @output
-    @render.text
+    @reactive.effect
     @reactive.event(input.generate_offer)
-    def offer_letter_text():
+    async def offer_letter_text():
         candidate_id = input.candidate_dropdown_doc()
         job_id = input.job_dropdown_doc()
 
@@ -117,7 +140,8 @@ def server(input, output, session):
         print("📦 job_id:", job_id)
 
         if not candidate_id or not job_id:
-            return "❌ Select a resume and a job."
+            await offer_stream.stream(["❌ Select a resume and a job."])
+            return
 
         ctx = get_candidate_context(candidate_id)
         job = get_job_context(job_id)
@@ -126,12 +150,14 @@ def server(input, output, session):
         print("📁 job loaded:", bool(job))
 
         if not ctx or not job:
-            return "❌ Missing candidate or job context."
+            await offer_stream.stream(["❌ Missing candidate or job context."])
+            return
 
         comp_override = input.override_compensation().strip()
         start_override = input.override_start_date().strip()
         notes_override = input.override_notes().strip()
 
+        # Streamed to the page as it is generated; other sessions keep responding meanwhile
         offer = draft_offer_letter(
             candidate_name=ctx.get("Name", "Candidate"),
             job_title=job.get("title", "Unknown Role"),
@@ -142,26 +168,27 @@ def server(input, output, session):
             hiring_manager_notes=notes_override or job.get("notes", "")
         )
 
-        ctx.setdefault("onboarding_docs", {})["offer_letter"] = offer
-        save_candidate_context(candidate_id, ctx)
-        return ui.HTML(f"<pre style='font-family: Georgia; font-size: 1rem'>{offer}</pre>")
+        await offer_stream.stream(
+            stream_and_save(offer, lambda text: save_candidate_offer(candidate_id, text))
+        )
 
     # === Contract generation ===
-    @output
-    @render.text
+    @reactive.effect
     @reactive.event(input.generate_contract)
-    def contract_text():
+    async def contract_text():
         candidate_id = input.candidate_dropdown_doc()
         job_id = input.job_dropdown_doc()
 
         if not candidate_id or not job_id:
-            return "❌ Select a resume and a job."
+            await contract_stream.stream(["❌ Select a resume and a job."])
+            return
 
         ctx = get_candidate_context(candidate_id)
         job = get_job_context(job_id)
 
         if not ctx or not job:
-            return "❌ Missing candidate or job context."
+            await contract_stream.stream(["❌ Missing candidate or job context."])
+            return
 
         comp_override = input.override_compensation().strip()
         start_override = input.override_start_date().strip()
@@ -176,9 +203,12 @@ def server(input, output, session):
             legal_notes=job.get("legal_notes", "Subject to U.S. labor law.")
         )
 
-        ctx.setdefault("onboarding_docs", {})["contract"] = contract
-        save_candidate_context(candidate_id, ctx)
-        return ui.HTML(f"<pre style='font-family: Georgia; font-size: 1rem'>{contract}</pre>")
+        def save_contract(text):
+            update_candidate_context(
+                candidate_id, lambda c: c.setdefault("onboarding_docs", {}).update(contract=text)
+            )
+
+        await contract_stream.stream(stream_and_save(contract, save_contract))
 
     @output
     @render.download(filename="Offer_Letter.pdf")
@@ -8,9 +8,9 @@ sys.path.append('../code')
 
 from context import (
     get_all_jobs,
-    get_all_candidates,
-    save_candidate_context
+    bulk_save_candidates
 )
+from server.context_events import job_ids_changed
 
 UPLOAD_DIR = Path(__file__).resolve().parents[2] / "milestone2" / "data" / "resumes"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -31,27 +31,33 @@ def server(input, output, session):
         if not fileinfo or not job_id:
             return "❌ Missing file or job ID."
 
-        file_meta = fileinfo[0]
-        resume_bytes = Path(file_meta["datapath"]).read_bytes()
+        new_candidates = {}
+        for file_meta in fileinfo:
+            resume_bytes = Path(file_meta["datapath"]).read_bytes()
 
-        candidate_id = str(uuid.uuid4())
-        filename = f"{candidate_id}.pdf"
-        target_path = UPLOAD_DIR / filename
-        target_path.write_bytes(resume_bytes)
+            candidate_id = str(uuid.uuid4())
+            filename = f"{candidate_id}.pdf"
+            target_path = UPLOAD_DIR / filename
+            target_path.write_bytes(resume_bytes)
 
-        candidate_data = {
-            "candidate_id": candidate_id,
-            "job_id": job_id,
-            "Resume File": filename,
-            "Application ID": str(uuid.uuid4())
-        }
-        save_candidate_context(candidate_id, candidate_data)
+            new_candidates[candidate_id] = {
+                "candidate_id": candidate_id,
+                "job_id": job_id,
+                "Resume File": filename,
+                "Application ID": str(uuid.uuid4())
+            }
+            print(f"✅ Uploaded {file_meta['name']} → job_id: {job_id}")
+
+        # One context write for the whole upload batch
+        bulk_save_candidates(new_candidates)
 
-        print(f"✅ Uploaded {file_meta['name']} → job_id: {job_id}")
-        return f"✅ Resume uploaded and linked to `{job_id[:8]}`.\nCandidate ID: `{candidate_id}`"
+        if len(new_candidates) == 1:
+            return f"✅ Resume uploaded and linked to `{job_id[:8]}`.\nCandidate ID: `{candidate_id}`"
+        return f"✅ {len(new_candidates)} resumes uploaded and linked to `{job_id[:8]}`."
 
     @reactive.effect
     def _populate_job_ids():
+        job_ids_changed()
         all_jobs = get_all_jobs()
 
         chart_choices = {
@@ -60,4 +66,6 @@ def server(input, output, session):
         }
 
         print(f"Job IDs: {len(chart_choices)} loaded")
-        ui.update_select("job_id_input", choices=chart_choices, selected=None)
+        with reactive.isolate():
+            selected = input.job_id_input()
+        ui.update_select("job_id_input", choices=chart_choices, selected=selected if selected in chart_choices else None)
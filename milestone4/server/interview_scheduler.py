@@ -1,14 +1,14 @@
 import sys
-import os, sys, json, io, zipfile
-import json
+import os, sys, io, zipfile
 import requests
 from dotenv import load_dotenv
 from shiny import reactive, render, ui
 
 # Access ../code/context.py
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "code")))
-from context import get_all_candidates
-from llm_connect import get_response
+from context import get_all_jobs, get_candidates_for_job, get_job_ids_with_candidates
+from server.context_events import job_ids_changed, job_candidates_changed
+from llm_connect import get_response, get_responses, astream_response
 
 from datetime import datetime
 from fpdf import FPDF
@@ -46,8 +46,8 @@ def schedule_interview(name, email):
     return f"{_event_url_cache}?name={name.replace(' ', '+')}&email={email}"
 
 
-def draft_invite_email_with_llm(name, email, link, job_data):
-    prompt = (
+def invite_email_prompt(name, email, link, job_data):
+    return (
         f"You are a recruiter inviting a candidate to schedule an interview.\n\n"
         f"Candidate Name: {name}\n"
         f"Candidate Email: {email}\n\n"
@@ -59,14 +59,29 @@ def draft_invite_email_with_llm(name, email, link, job_data):
         f"Include the scheduling link. Return only the email body text. No formatting or extra explanation.\n"
     )
 
-    return get_response(
-        input=prompt,
-        template=lambda x: x,
-        llm="llama",
-        md=False,
-        temperature=0.7,
-        max_tokens=500,
-    )
+
+INVITE_EMAIL_OPTIONS = dict(
+    template=lambda x: x,
+    llm="auto",
+    hedge=True,
+    md=False,
+    temperature=0.7,
+    max_tokens=500,
+    label="draft_invite_email_with_llm",
+)
+
+
+def draft_invite_email_with_llm(name, email, link, job_data):
+    return get_response(input=invite_email_prompt(name, email, link, job_data), **INVITE_EMAIL_OPTIONS)
+
+
+def draft_invite_emails_with_llm(invites, job_data):
+    """
+    Invitation emails for several (name, email, link) at once, drafted concurrently.
+    In input order; a failed draft is returned as its exception.
+    """
+    prompts = [invite_email_prompt(name, email, link, job_data) for name, email, link in invites]
+    return get_responses(prompts, **INVITE_EMAIL_OPTIONS)
 
 def export_email_as_pdf(name, email_text):
     pdf = FPDF()
@@ -92,16 +107,10 @@ def server(input, output, session):
 
     @reactive.Calc
     def job_options():
-        raw_candidates = get_all_candidates()
-        job_ids_used = {c.get("job_id") for c in raw_candidates.values() if "job_id" in c}
-
-        path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "milestone2", "data", "mcp_context.json"))
+        job_ids_changed()
         try:
-            with open(path, "r") as f:
-                full = json.load(f)
-                all_jobs = full.get("jobs", {})
-                session._memo["all_jobs"] = all_jobs
-                session._memo["all_candidates"] = full.get("candidates", {})
+            job_ids_used = get_job_ids_with_candidates()
+            all_jobs = get_all_jobs()
 
             # Build job_id: label mapping only for jobs with candidates
             job_choices = {
@@ -123,8 +132,11 @@ def server(input, output, session):
         job_ids = job_options()
         if not job_ids:
             return ui.p("No jobs available.")
+        # Keep the current job when the list refreshes after a context change
+        with reactive.isolate():
+            selected = input.selected_job() if "selected_job" in input else None
         return ui.div(
-            ui.input_select("selected_job", "Select Job ID", choices=job_ids),
+            ui.input_select("selected_job", "Select Job ID", choices=job_ids, selected=selected if selected in job_ids else None),
             ui.output_ui("candidate_checkbox")
         )
 
@@ -135,7 +147,8 @@ def server(input, output, session):
         if not job_id:
             return ui.p("Select a job to view candidates.")
 
-        candidates = session._memo.get("all_candidates", {})
+        job_candidates_changed(job_id)
+        candidates = get_candidates_for_job(str(job_id).strip())
         filtered = [
             {
                 "label": f"{c['Name']} ({c['Email']})",
@@ -143,7 +156,6 @@ def server(input, output, session):
                 "email": c["Email"]
             }
             for c in candidates.values()
-            if str(c.get("job_id", "")).strip() == str(job_id).strip()
         ]
 
         session._memo["filtered_candidates"] = filtered
@@ -151,10 +163,15 @@ def server(input, output, session):
         if not filtered:
             return ui.p("No candidates match this job.")
 
+        labels = [c["label"] for c in filtered]
+        with reactive.isolate():
+            checked = [label for label in (input.selected_names() if "selected_names" in input else ()) if label in labels]
+
         return ui.input_checkbox_group(
             "selected_names",
             "Select candidates to schedule",
-            choices=[c["label"] for c in filtered]
+            choices=labels,
+            selected=checked
         )
 
     @output
@@ -168,23 +185,35 @@ def server(input, output, session):
         job_id = input.selected_job()
         session._memo["active_job_id"] = job_id
 
-        job_data = session._memo.get("all_jobs", {}).get(job_id, {})
+        job_data = get_all_jobs().get(job_id, {})
         candidates = {
             f"{c['name']} ({c['email']})": c
             for c in session._memo.get("filtered_candidates", [])
         }
 
-        results = []
+        results = {}
         pdf_paths = []
 
+        # Scheduling links first, then every email drafted in one concurrent batch
+        invites = []
         for label in selected:
             c = candidates.get(label)
             if not c:
-                results.append(ui.p(f"{label}: Not found"))
+                results[label] = ui.p(f"{label}: Not found")
                 continue
             try:
-                link = schedule_interview(c['name'], c['email'])
-                email_text = draft_invite_email_with_llm(c['name'], c['email'], link, job_data)
+                invites.append((label, c, schedule_interview(c['name'], c['email'])))
+            except Exception as e:
+                results[label] = ui.p(f"{c['name']}: ERROR - {e}")
+
+        emails = draft_invite_emails_with_llm(
+            [(c['name'], c['email'], link) for _, c, link in invites], job_data
+        )
+
+        for (label, c, link), email_text in zip(invites, emails):
+            try:
+                if isinstance(email_text, Exception):
+                    raise email_text
 
                 # Sanitize name + timestamp
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -212,15 +241,15 @@ def server(input, output, session):
                 # Store PDF
                 pdf_paths.append(pdf_path)
 
-                results.append(
-                    ui.HTML(f"<p><b>{c['name']}</b>: <a href='{link}' target='_blank'>📅 Schedule</a> — PDF ready</p>")
+                results[label] = ui.HTML(
+                    f"<p><b>{c['name']}</b>: <a href='{link}' target='_blank'>📅 Schedule</a> — PDF ready</p>"
                 )
 
             except Exception as e:
-                results.append(ui.p(f"{c['name']}: ERROR - {e}"))
+                results[label] = ui.p(f"{c['name']}: ERROR - {e}")
 
         session._memo["pdf_paths"] = pdf_paths
-        return ui.div(*results)
+        return ui.div(*(results[label] for label in selected if label in results))
 
 
     @output
@@ -308,16 +337,32 @@ def server(input, output, session):
 
         return zip_path
 
-    @output
-    @render.text
+    refined_stream = ui.MarkdownStream("refined_output")
+
+    async def refined_chunks(prompt):
+        try:
+            async for chunk in astream_response(
+                input=prompt,
+                template=lambda x: x,
+                llm="llama",
+                temperature=0.6,
+                max_tokens=600,
+                label="refine_invite_email",
+            ):
+                yield chunk
+        except Exception as e:
+            yield f"❌ LLM failed: {e}"
+
+    @reactive.effect
     @reactive.event(input.submit_chat)
-    def refined_output():
+    async def refined_output():
         user_instruction = input.chat_prompt().strip()
         selected = input.selected_pdf()
         job_id = session._memo.get("active_job_id", "").strip()
 
         if not selected or not job_id:
-            return "⚠️ Select a PDF to edit."
+            await refined_stream.stream(["⚠️ Select a PDF to edit."])
+            return
 
         # Load original text
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -325,7 +370,8 @@ def server(input, output, session):
 
 
         if not os.path.exists(pdf_path):
-            return "❌ Could not find the original PDF."
+            await refined_stream.stream(["❌ Could not find the original PDF."])
+            return
 
         reader = PdfReader(pdf_path)
         original_text = "\n".join([page.extract_text() or "" for page in reader.pages])
@@ -338,18 +384,7 @@ def server(input, output, session):
             f"Please revise the email accordingly. Return only the revised email."
         )
 
-        try:
-            revised = get_response(
-                input=full_prompt,
-                template=lambda x: x,
-                llm="llama",
-                md=False,
-                temperature=0.6,
-                max_tokens=600
-            )
-            return revised.strip()
-        except Exception as e:
-            return f"❌ LLM failed: {e}"
+        await refined_stream.stream(refined_chunks(full_prompt))
         
 
     @reactive.effect
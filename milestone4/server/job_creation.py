@@ -1,8 +1,7 @@
 from shiny import reactive, render, ui
 import uuid
 import os
-import markdown
-from llm_connect import get_response
+from llm_connect import get_response, astream_response
 from context import save_job_context
 import json
 
@@ -10,7 +9,7 @@ import json
 response_cache = reactive.Value("")
 
 
-def call_chatbot(user_input: str, session_id: str) -> str:
+def stream_chatbot(user_input: str, session_id: str):
     prompt = (
         "You are an intelligent recruiting assistant.\n"
         "If the user asks to generate a job description, do so with sections:\n"
@@ -20,7 +19,9 @@ def call_chatbot(user_input: str, session_id: str) -> str:
         "If the user asks anything else, just respond helpfully.\n\n"
         f"User: {user_input}"
     )
-    return get_response(input=prompt, template=lambda x: x, llm="llama", md=False, temperature=0.9, max_tokens=1000).strip()
+    return astream_response(
+        input=prompt, template=lambda x: x, llm="llama", temperature=0.9, max_tokens=1000, label="job_chatbot"
+    )
 
 
 def extract_job_metadata(job_description: str) -> dict:
@@ -49,7 +50,10 @@ Job Description:
         llm="llama",
         md=False,
         temperature=0.2,
-        max_tokens=200
+        max_tokens=200,
+        cache=True,
+        validate=json.loads,
+        label="extract_job_metadata",
     )
 
     try:
@@ -67,28 +71,37 @@ def server(input, output, session):
     session_id = str(uuid.uuid4())
     chat_status = reactive.Value("")
     save_status = reactive.Value("")
+    chat_stream = ui.MarkdownStream("job_chat_response")
+
+    async def job_chat_chunks(user_input):
+        chunks = []
+        try:
+            async for chunk in stream_chatbot(user_input, session_id):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            chunks = []
+            yield f"\n\n**❌ Error:** {str(e)}"
+
+        # Runs outside the reactive flush (the stream is an extended task), so take the lock to publish
+        async with reactive.lock():
+            response_cache.set("".join(chunks).strip())
+            chat_status.set("")
+            await reactive.flush()
 
-    @output
-    @render.ui
+    @reactive.effect
     @reactive.event(input.submit_btn)
-    def job_chat_response():
+    async def job_chat_response():
         user_input = input.user_input().strip()
 
         if not user_input:
-            return ui.HTML("<i>⚠️ Please enter a prompt.</i>")
+            await chat_stream.stream(["*⚠️ Please enter a prompt.*"])
+            return
 
         chat_status.set("💬 Thinking...")
-
-        try:
-            raw_response = call_chatbot(user_input, session_id)
-            response_cache.set(raw_response)
-            html = markdown.markdown(raw_response, extensions=["extra", "sane_lists"])
-        except Exception as e:
-            html = f"<b>❌ Error:</b> {str(e)}"
-            response_cache.set("")
-
-        chat_status.set("")
-        return ui.HTML(html)
+        response_cache.set("")
+        # Tokens are pushed to the page as they arrive
+        await chat_stream.stream(job_chat_chunks(user_input))
 
 
     @reactive.effect()
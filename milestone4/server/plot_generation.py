@@ -1,4 +1,3 @@
-import os
 import sys
 sys.path.append('../code')
 
@@ -16,11 +15,12 @@ import tempfile
 
 load_dotenv()
 
-import google.generativeai as genai
 from google.generativeai.types import FunctionDeclaration, Tool
 
-from llm_connect import get_response
-from context import get_all_candidates, get_all_jobs
+from llm_connect import get_response, get_gemini_model, send_chat_message
+from context import get_all_jobs, get_job_ids_with_candidates
+from candidate_frames import get_candidate_frame
+from server.context_events import job_ids_changed, job_candidates_changed
 import uuid
 
 
@@ -79,8 +79,7 @@ plot_func_schema = FunctionDeclaration(
 )
 
 plot_tool = Tool(function_declarations=[plot_func_schema])
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash", tools=[plot_tool])
+TOOLS = [plot_tool]
 
 
 # === MAIN SHINY SERVER FUNCTION ===
@@ -95,8 +94,8 @@ def server(input, output, session):
 
     @reactive.effect
     def _populate_job_ids():
-        raw_candidates = get_all_candidates()
-        job_ids_used = {c.get("job_id") for c in raw_candidates.values() if "job_id" in c}
+        job_ids_changed()
+        job_ids_used = get_job_ids_with_candidates()
 
         all_jobs = get_all_jobs()
 
@@ -107,17 +106,18 @@ def server(input, output, session):
         }
 
         print(f"📊 Chart Job IDs: {len(chart_choices)} loaded")
-        ui.update_select("chart_job_id", choices=chart_choices, selected="")
+        with reactive.isolate():
+            selected = input.chart_job_id()
+        ui.update_select("chart_job_id", choices=chart_choices, selected=selected if selected in chart_choices else "")
     
     @reactive.Calc
     def candidates():
-        raw = get_all_candidates()
         filtered_job = input.chart_job_id()
         if not filtered_job:
             print("⚠️ No job selected.")
             return pd.DataFrame()
-        df = pd.DataFrame([c for c in raw.values() if c.get("job_id") == filtered_job])
-        return df
+        job_candidates_changed(filtered_job)
+        return get_candidate_frame(filtered_job)
     
     @reactive.Calc
     def plot_inputs():
@@ -145,12 +145,15 @@ def server(input, output, session):
         if df.empty:
             return 
         exclude = {"Name", "Email", "Resume File", "Key Skills", "Llama Summary", "Gemini Summary",
-                   "Note", "candidate_id", "job_id", "application_date", "source"}
+                   "Note", "candidate_id", "job_id", "application_date", "source", "onboarding_docs", "_version"}
         valid = [c for c in df.columns if c not in exclude]
         default_x = valid[0] if valid else ""
         default_y = valid[1] if len(valid) > 1 else default_x
-        ui.update_select("chart_x", choices=valid, selected=default_x)
-        ui.update_select("chart_y", choices=valid, selected=default_y)
+        # Candidate saves re-run this; keep the user's columns when they still exist
+        with reactive.isolate():
+            chart_x, chart_y = input.chart_x(), input.chart_y()
+        ui.update_select("chart_x", choices=valid, selected=chart_x if chart_x in valid else default_x)
+        ui.update_select("chart_y", choices=valid, selected=chart_y if chart_y in valid else default_y)
     
 
     @output
@@ -213,8 +216,8 @@ def server(input, output, session):
                 "Be detailed and be clear of why the chart shapes up the way it did."
             )
 
-            chat = model.start_chat()
-            response = chat.send_message(prompt)
+            chat = get_gemini_model("gemini-2.0-flash", tools=TOOLS).start_chat()
+            response = send_chat_message(chat, prompt, label="chart_explanation")
             explanation = markdown.markdown(response.text.strip())
             last_chat.set(chat)
         except Exception as e:
@@ -257,8 +260,8 @@ def server(input, output, session):
         )
 
         try:
-            chat = model.start_chat()
-            response = chat.send_message(followup)
+            chat = get_gemini_model("gemini-2.0-flash", tools=TOOLS).start_chat()
+            response = send_chat_message(chat, followup, label="chart_chat")
             if hasattr(response, "text") and response.text:
                 explanation = markdown.markdown(response.text.strip())
             else:
@@ -12,6 +12,12 @@ ui = ui.nav_panel(
             ui.h4("🎯 Evaluation Controls"),
             ui.input_select("job_dropdown_for_doc", "Select Job", choices=[]),
             ui.input_select("candidate_dropdown_for_doc", "Select Candidate", choices=[]),
+            ui.div(
+                ui.input_action_button("bulk_evaluate", "⚡ Evaluate All Pending"),
+                ui.input_action_button("bulk_cancel", "✖ Cancel", class_="ms-2"),
+                class_="mb-2"
+            ),
+            ui.output_ui("bulk_progress"),
 
             ui.tags.hr(),
             ui.h4("📊 Score Summary"),
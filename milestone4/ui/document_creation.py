@@ -20,7 +20,7 @@ document_creation_ui = ui.nav_panel(
         ui.card(
             ui.h4("Generated Offer Letter"),
             ui.div(
-                ui.output_text("offer_letter_text"),
+                ui.output_markdown_stream("offer_letter_text"),
                 ui.download_button("download_offer", "📥 Download Offer Letter as PDF"),
                 style="""
                     border: 1px solid #ccc;
@@ -39,7 +39,7 @@ document_creation_ui = ui.nav_panel(
             ui.hr(),
             ui.h4("Generated Contract"),
             ui.div(
-                ui.output_text("contract_text"),
+                ui.output_markdown_stream("contract_text"),
                 ui.download_button("download_contract", "📥 Download Contract as PDF"),
                 style="""
                     border: 1px solid #ccc;
@@ -43,7 +43,7 @@ ui = ui.nav_panel(
     ui.card(
         ui.h4("📤 Upload Resume & Link to Job"),
         ui.layout_columns(
-            ui.input_file("resume_file", "Upload Resume", accept=[".pdf", ".docx"]),
+            ui.input_file("resume_file", "Upload Resumes", accept=[".pdf", ".docx"], multiple=True),
             ui.input_select("job_id_input", "Select Job", choices=[]),  # To be populated by server
             col_widths=(6, 6)
         ),
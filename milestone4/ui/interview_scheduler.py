@@ -66,7 +66,7 @@ interview_scheduler_ui = ui.nav_panel(
                 ui.input_action_button("submit_chat", "✏️ Apply Change"),
                 style="margin-top: 1em;"
             ),
-            ui.output_text_verbatim("refined_output"),
+            ui.output_markdown_stream("refined_output"),
 
             ui.hr(),
             ui.h4("Edit Email"),
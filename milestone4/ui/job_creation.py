@@ -19,7 +19,7 @@ app_ui = ui.nav_panel(
     # Box 2: LLM Response
     ui.card(
         ui.h4("LLM Response"),
-        ui.output_ui("job_chat_response"),
+        ui.output_markdown_stream("job_chat_response"),
         style="""
             padding: 1.5em;
             background-color: #f9f9f9;